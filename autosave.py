@@ -0,0 +1,333 @@
+"""Журнал автосохранения открытых заказов.
+
+Каждое изменение формы (поле шапки, строка таблицы, изображение) записывается
+небольшой записью JSON в конец файла журнала заказа, по одной записи в строке.
+Запись в файл выполняет фоновый поток журнала, окно только ставит записи в
+очередь. Поток держит своё состояние заказа (JournalState) и, когда после
+последнего снимка накопилось COMPACT_EVERY записей, заменяет файл одним
+снимком. Файл с оборванной при сбое последней строкой читается без неё.
+
+Журнал принадлежит одной копии программы: рядом с ним лежит файл
+<журнал>.lock, заблокированный средствами ОС (JournalLock), пока журнал
+открыт. Блокировку снимает и ОС при завершении процесса, поэтому журналы
+упавшей копии восстанавливаются, а журналы работающей - нет.
+
+Записи журнала (поле "op"):
+    snapshot   всё состояние заказа: info, commission, columns, images;
+    info       поле шапки: field, value;
+    commission процент комиссии: value;
+    table      все строки таблицы: columns;
+    rows       вставка строк lines перед row (row = null - в конец);
+    set        замена строки row на line;
+    remove     удаление count строк начиная с row;
+    images     весь список изображений: items;
+    image_add  добавление изображения: path, digest;
+    image_remove удаление изображения row.
+Строка таблицы - [название, ед. изм., кол-во, цена, примечание], columns -
+словарь списков names, units, quantities, prices, notes.
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+from order_core import INFO_FIELDS
+
+AUTOSAVE_FOLDER = "autosave"
+CLEARED_FOLDER = os.path.join(AUTOSAVE_FOLDER, "cleared")
+JOURNAL_SUFFIX = ".jsonl"
+LOCK_SUFFIX = ".lock"
+# После скольких записей с последнего снимка журнал сжимается в снимок
+COMPACT_EVERY = 1000
+# Сколько журналов очищенных заказов хранить
+CLEARED_KEEP = 10
+
+COLUMNS = ("names", "units", "quantities", "prices", "notes")
+
+
+def line_values(name, unit, quantity, price, note):
+    """Строка таблицы в формате журнала."""
+    return [name, unit, quantity, price, note]
+
+
+class JournalState:
+    """Состояние заказа, восстановленное из записей журнала."""
+    __slots__ = ("info", "commission", "names", "units", "quantities", "prices", "notes", "images")
+
+    def __init__(self):
+        self.info = dict.fromkeys(INFO_FIELDS, "")
+        self.commission = None
+        self.names = []
+        self.units = []
+        self.quantities = []
+        self.prices = []
+        self.notes = []
+        self.images = []  # [путь, хеш]
+
+    def __len__(self):
+        return len(self.names)
+
+    def is_empty(self):
+        return not self.names and not self.images and not any(
+            self.info[field] for field in ("serial", "company", "responsible", "phone", "address")
+        )
+
+    def _set_columns(self, columns):
+        for column in COLUMNS:
+            setattr(self, column, list(columns.get(column, ())))
+
+    def _insert(self, row, lines):
+        if row is None:
+            row = len(self.names)
+        for position, column in enumerate(COLUMNS):
+            getattr(self, column)[row:row] = [line[position] for line in lines]
+
+    def apply(self, record):
+        """Применить запись журнала."""
+        op = record["op"]
+        if op == "snapshot":
+            self.info.update(record["info"])
+            self.commission = record["commission"]
+            self._set_columns(record["columns"])
+            self.images = [list(item) for item in record["images"]]
+        elif op == "info":
+            self.info[record["field"]] = record["value"]
+        elif op == "commission":
+            self.commission = record["value"]
+        elif op == "table":
+            self._set_columns(record["columns"])
+        elif op == "rows":
+            self._insert(record["row"], record["lines"])
+        elif op == "set":
+            row = record["row"]
+            if row < len(self.names):
+                for position, column in enumerate(COLUMNS):
+                    getattr(self, column)[row] = record["line"][position]
+        elif op == "remove":
+            row, count = record["row"], record["count"]
+            for column in COLUMNS:
+                del getattr(self, column)[row:row + count]
+        elif op == "images":
+            self.images = [list(item) for item in record["items"]]
+        elif op == "image_add":
+            self.images.append([record["path"], record["digest"]])
+        elif op == "image_remove":
+            del self.images[record["row"]:record["row"] + 1]
+
+    def snapshot(self):
+        """Запись snapshot со всем состоянием."""
+        return {
+            "op": "snapshot",
+            "info": self.info,
+            "commission": self.commission,
+            "columns": {column: getattr(self, column) for column in COLUMNS},
+            "images": self.images,
+        }
+
+
+def replay_journal(path):
+    """Прочитать журнал и вернуть (JournalState, число записей).
+
+    Нечитаемые строки (оборванная при сбое последняя запись) пропускаются.
+    """
+    state = JournalState()
+    count = 0
+    with open(path, encoding="utf-8") as file:
+        for text in file:
+            try:
+                record = json.loads(text)
+            except ValueError:
+                continue
+            state.apply(record)
+            count += 1
+    return state, count
+
+
+def journal_paths(folder=AUTOSAVE_FOLDER):
+    """Журналы в папке, от старых к новым."""
+    if not os.path.isdir(folder):
+        return []
+    paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(JOURNAL_SUFFIX)]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def new_journal_path(folder=AUTOSAVE_FOLDER):
+    """Путь для журнала нового заказа (файл создаётся при первой записи)."""
+    return os.path.join(folder, f"order_{time.time_ns()}{JOURNAL_SUFFIX}")
+
+
+def _lock_file(file):
+    """Заблокировать открытый файл без ожидания; False, если он заблокирован другим процессом."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class JournalLock:
+    """Владение журналом: блокировка файла <журнал>.lock."""
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.path = journal_path + LOCK_SUFFIX
+        self._file = None
+
+    def acquire(self):
+        """Взять журнал; False, если он занят другой копией программы."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = open(self.path, "a")
+        if not _lock_file(file):
+            file.close()
+            return False
+        # Прежний владелец мог удалить файл блокировки между open и блокировкой
+        if os.name != "nt":
+            try:
+                same_file = os.stat(self.path).st_ino == os.fstat(file.fileno()).st_ino
+            except OSError:
+                same_file = False
+            if not same_file:
+                file.close()
+                return False
+        self._file = file
+        return True
+
+    def release(self, remove=False):
+        """Отпустить журнал; remove - удалить и файл блокировки (журнала больше нет)."""
+        if self._file is None:
+            return
+        if remove and os.name != "nt":
+            os.remove(self.path)  # Пока блокировка взята, файл никто не откроет заново
+        self._file.close()
+        self._file = None
+        if remove and os.name == "nt":
+            try:
+                os.remove(self.path)  # В Windows открытый файл удалить нельзя
+            except OSError:
+                pass
+
+
+def claim_journal(path):
+    """Взять существующий журнал для восстановления: JournalLock или None, если журнал
+    принадлежит другой копии программы или уже удалён ею."""
+    lock = JournalLock(path)
+    if not lock.acquire():
+        return None
+    if not os.path.exists(path):
+        lock.release(remove=True)
+        return None
+    return lock
+
+
+class OrderJournal:
+    """Журнал одного заказа с записью в фоновом потоке.
+
+    state - состояние уже записанного журнала (при восстановлении); журнал
+    в этом случае сразу сжимается в снимок. lock - взятая JournalLock
+    восстановленного журнала; для нового журнала блокировка берётся здесь.
+    """
+
+    def __init__(self, path, state=None, lock=None):
+        self.path = path
+        if lock is None:
+            lock = JournalLock(path)
+            lock.acquire()  # Путь нового журнала уникален, блокировка свободна
+        self._lock = lock
+        self._queue = queue.Queue()
+        self._thread = None
+        self._recovered = state is not None
+        self._state = state if state is not None else JournalState()  # Состояние без строк - пустое по len()
+        self._since_snapshot = 0
+
+    def is_blank(self):
+        """В журнал ещё ничего не записано (заказ не меняли)."""
+        return self._thread is None and not self._recovered
+
+    def append(self, record):
+        """Поставить запись в очередь на запись."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+        self._queue.put(record)
+
+    def _stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Дописать очередь, остановить поток и отпустить журнал (он откроется при следующем запуске)."""
+        self._stop()
+        self._lock.release(remove=not os.path.exists(self.path))  # Блокировка журнала без записей не нужна
+
+    def discard(self):
+        """Закрыть журнал и удалить его файл (заказ больше не нужен)."""
+        self._stop()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._lock.release(remove=True)
+
+    def archive(self, folder=CLEARED_FOLDER, keep=CLEARED_KEEP):
+        """Закрыть журнал и перенести файл в папку очищенных заказов.
+
+        Возвращает состояния (JournalState) вытесненных из папки старых
+        журналов: их заказы восстановить уже нельзя.
+        """
+        self._stop()
+        if not os.path.exists(self.path):
+            self._lock.release(remove=True)
+            return []
+        os.makedirs(folder, exist_ok=True)
+        shutil.move(self.path, os.path.join(folder, os.path.basename(self.path)))
+        self._lock.release(remove=True)
+        dropped = []
+        for path in journal_paths(folder)[:-keep]:
+            dropped.append(replay_journal(path)[0])
+            os.remove(path)
+        return dropped
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        return open(self.path, "a", encoding="utf-8")
+
+    def _compact(self, file):
+        """Заменить файл журнала одним снимком состояния."""
+        file.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as temp:
+            temp.write(json.dumps(self._state.snapshot(), ensure_ascii=False) + "\n")
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.replace(temp_path, self.path)
+        self._since_snapshot = 0
+        return self._open()
+
+    def _run(self):
+        file = self._open()
+        if self._recovered:
+            file = self._compact(file)
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    file.close()
+                    return
+                self._state.apply(record)
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._since_snapshot += 1
+                if self._queue.empty():
+                    file.flush()  # После сбоя программы журнал читается до последней записи
+                if self._since_snapshot >= COMPACT_EVERY:
+                    file = self._compact(file)
+            except Exception as e:
+                print(f"Ошибка записи журнала автосохранения {self.path}: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,115 @@
+"""Пакетная обработка файлов заказов без графического интерфейса.
+
+Пример: python batch.py входная_папка выходная_папка --commission 15
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from excel_io import read_order, write_order
+from order_core import RunningTotal, total_with_commission
+
+DEFAULT_COMMISSION = 15
+
+
+def convert_workbook(input_path, output_path, commission):
+    """Пересчитать один файл заказа и сохранить его в отформатированном виде.
+
+    Возвращает (число строк, итог с комиссией). Выполняется в дочернем процессе.
+    """
+    order, chunks, _total_rows = read_order(input_path)
+    totals = RunningTotal()
+    line_count = 0
+
+    def lines():
+        nonlocal line_count
+        for chunk in chunks:
+            totals.add(line.amount for line in chunk)
+            line_count += len(chunk)
+            yield from chunk
+
+    order.lines = lines()
+    write_order(output_path, order)
+    return line_count, total_with_commission(totals.subtotal, commission)
+
+
+def find_workbooks(input_dir):
+    """Файлы .xlsx в папке (без временных файлов Excel)."""
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")
+    )
+
+
+def check_dirs(input_dir, output_dir):
+    """ValueError, если выходная папка совпадает с входной или вложена в неё (или наоборот).
+
+    Иначе готовые файлы заменили бы исходные, а следующий запуск обработал бы их повторно.
+    """
+    input_real = os.path.normcase(os.path.realpath(input_dir))
+    output_real = os.path.normcase(os.path.realpath(output_dir))
+    try:
+        common = os.path.commonpath([input_real, output_real])
+    except ValueError:  # Папки на разных дисках Windows
+        return
+    if common in (input_real, output_real):
+        raise ValueError(
+            f"Выходная папка {output_dir} не должна совпадать с входной {input_dir} или быть вложенной в неё"
+        )
+
+
+def run_batch(input_dir, output_dir, commission=DEFAULT_COMMISSION, workers=None):
+    """Обработать все файлы папки параллельно. Возвращает число ошибок."""
+    check_dirs(input_dir, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = find_workbooks(input_dir)
+    started = time.perf_counter()
+    total_rows = 0
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                convert_workbook, path, os.path.join(output_dir, os.path.basename(path)), commission
+            ): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                rows, total = future.result()
+            except Exception as e:
+                failures.append((path, e))
+                print(f"Ошибка: {path}: {e}")
+                continue
+            total_rows += rows
+            print(f"{os.path.basename(path)}: строк {rows}, итог {total:.2f} AZN")
+
+    elapsed = time.perf_counter() - started
+    processed = len(paths) - len(failures)
+    print(
+        f"Обработано файлов: {processed} из {len(paths)}, строк: {total_rows}, "
+        f"время: {elapsed:.2f} с, {processed / elapsed if elapsed else 0:.1f} файлов/с, "
+        f"{total_rows / elapsed if elapsed else 0:.0f} строк/с, ошибок: {len(failures)}"
+    )
+    return len(failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный пересчёт и форматирование файлов заказов.")
+    parser.add_argument("input_dir", help="папка с файлами .xlsx")
+    parser.add_argument("output_dir", help="папка для готовых файлов")
+    parser.add_argument("--commission", type=float, default=DEFAULT_COMMISSION, help="комиссия, %%")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию - число ядер)")
+    args = parser.parse_args(argv)
+    try:
+        failures = run_batch(args.input_dir, args.output_dir, args.commission, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
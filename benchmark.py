@@ -0,0 +1,228 @@
+"""Замеры производительности расчёта итогов, загрузки и сохранения Excel.
+
+Каждый замер выполняется в отдельном процессе с платформой Qt offscreen,
+чтобы пиковое потребление памяти относилось только к нему. Элементы -
+строки заказа для загрузки и сохранения и правки ячеек для итогов.
+Замер startup (импорт модуля приложения и показ окна) не зависит от
+числа строк и выполняется один раз. Замер submit доставляет заказы по
+SUBMIT_ORDER_LINES строк (всего столько строк, сколько задано размером)
+через очередь отправки в локальную точку приёма HTTP; элементы - заказы.
+
+Примеры:
+    python benchmark.py
+    python benchmark.py --sizes 100 10000 --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --threshold 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [100, 10000, 100000]
+CASES = ["startup", "totals", "import", "export", "submit"]
+# Сколько правок ячеек выполняется в замере итогов
+TOTALS_EDITS = 1000
+# Строк в одном заказе в замере отправки
+SUBMIT_ORDER_LINES = 100
+
+
+def synthetic_order(line_count):
+    """Заказ с line_count строками продуктов."""
+    from order_core import Order, OrderLine
+
+    return Order(
+        serial="1111", company="Benchmark", responsible="Тест", phone="+994000000000",
+        start_date="01.12.2024", end_date="31.12.2024", address="Баку",
+        lines=[
+            OrderLine(f"Продукт {number}", "шт", float(number % 50 + 1), round(number * 0.37 % 500, 2), "")
+            for number in range(line_count)
+        ]
+    )
+
+
+def workbook_path(folder, line_count):
+    """Файл заказа с line_count строками (создаётся один раз на запуск)."""
+    from excel_io import write_order
+
+    path = os.path.join(folder, f"order_{line_count}.xlsx")
+    if not os.path.exists(path):
+        write_order(path, synthetic_order(line_count))
+    return path
+
+
+def peak_rss_mb():
+    """Пиковый размер резидентной памяти процесса в МБ (None, если недоступно)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux значение в КБ, в macOS - в байтах
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_submit(line_count):
+    """Отправить заказы через очередь в локальную точку приёма и вернуть (время, число заказов)."""
+    from submission import HttpTransport, IntakeDatabase, LocalReceiver, SubmissionService
+
+    order = synthetic_order(SUBMIT_ORDER_LINES)
+    order_count = max(1, line_count // SUBMIT_ORDER_LINES)
+    # Свои базы на каждый запуск: заказы прошлых размеров не должны засчитываться
+    run_folder = tempfile.mkdtemp(prefix="submit_", dir=".")
+    intake_path = os.path.join(run_folder, "intake.db")
+    receiver = LocalReceiver(intake_path, port=0)
+    service = SubmissionService(HttpTransport(receiver.start()), os.path.join(run_folder, "outbox.db"))
+    service.start()
+    with IntakeDatabase(intake_path) as intake:
+        started = time.perf_counter()
+        for _number in range(order_count):
+            service.submit(order, 15)
+        while intake.count() < order_count:
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+    service.stop()
+    receiver.stop()
+    return elapsed, order_count
+
+
+def isolated_window(folder):
+    """Окно приложения с пустыми настройками в папке замера.
+
+    Прайс-листы и адрес отправки из настроек пользователя не открываются
+    и не влияют на результат.
+    """
+    from PyQt5.QtCore import QSettings
+    from pl_hesablama import OrderApp
+
+    return OrderApp(settings=QSettings(os.path.join(folder, "settings.ini"), QSettings.IniFormat))
+
+
+def run_case(case, line_count, folder):
+    """Выполнить один замер в текущем процессе и вернуть (время, число обработанных элементов)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    os.chdir(folder)  # Служебные файлы приложения создаются во временной папке
+
+    if case == "submit":
+        return run_submit(line_count)
+
+    if case == "startup":
+        started = time.perf_counter()
+        window = isolated_window(folder)
+        window.show()
+        app.processEvents()
+        return time.perf_counter() - started, 1
+
+    from pl_hesablama import COL_QTY
+    from workers import LoadExcelJob, SaveExcelJob
+
+    window = isolated_window(folder)
+    window.thread_pool.waitForDone()  # Фоновые задачи запуска не попадают в замер
+
+    if case == "totals":
+        window.table_model.set_lines(synthetic_order(line_count).lines)
+        index = window.table_model.index
+        started = time.perf_counter()
+        for edit in range(TOTALS_EDITS):
+            window.table_model.setData(index(edit % line_count, COL_QTY), str(edit % 7 + 1))
+        window.commission_input.setValue(10)
+        elapsed = time.perf_counter() - started
+        items = TOTALS_EDITS
+    elif case == "import":
+        path = workbook_path(folder, line_count)
+        started = time.perf_counter()
+        job = LoadExcelJob(path)
+        job.signals.info.connect(window.show_order_info)
+        job.signals.rows.connect(window.table_model.append_lines)
+        job.run()  # Сигналы из того же потока доставляются сразу
+        app.processEvents()
+        elapsed = time.perf_counter() - started
+        items = window.table_model.rowCount()
+    elif case == "export":
+        window.table_model.set_lines(synthetic_order(line_count).lines)
+        started = time.perf_counter()
+        SaveExcelJob(os.path.join(folder, f"export_{line_count}.xlsx"), window.current_order()).run()
+        elapsed = time.perf_counter() - started
+        items = line_count
+    else:
+        raise ValueError(f"Неизвестный замер: {case}")
+    return elapsed, items
+
+
+def measure(case, line_count, folder):
+    """Запустить замер в дочернем процессе и вернуть словарь результатов."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", case, str(line_count), folder],
+        check=True, capture_output=True, text=True,
+        env=dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Сравнить с базовыми результатами; вернуть число замеров, ставших медленнее порога."""
+    regressions = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        change = (result["seconds"] - base["seconds"]) / base["seconds"] * 100 if base["seconds"] else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  <-- медленнее"
+            regressions += 1
+        print(f"{key:>16}: {base['seconds']:.4f} с -> {result['seconds']:.4f} с ({change:+.1f}%){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности заказов.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="число строк в заказе")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--save-baseline", metavar="FILE", help="сохранить результаты как базовые")
+    parser.add_argument("--baseline", metavar="FILE", help="сравнить с базовыми результатами")
+    parser.add_argument("--threshold", type=float, default=20.0, help="допустимое замедление, %%")
+    parser.add_argument("--run-case", nargs=3, metavar=("CASE", "SIZE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        case, line_count, folder = args.run_case
+        elapsed, items = run_case(case, int(line_count), folder)
+        print(json.dumps({"seconds": elapsed, "items": items, "peak_rss_mb": peak_rss_mb()}))
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        runs = [("startup", 0)] if "startup" in args.cases else []
+        for line_count in args.sizes:
+            runs.extend((case, line_count) for case in args.cases if case != "startup")
+        for case, line_count in runs:
+            if case == "import":
+                workbook_path(folder, line_count)  # Файл готовится вне замера
+            result = measure(case, line_count, folder)
+            result["items_per_sec"] = result["items"] / result["seconds"] if result["seconds"] else 0.0
+            results[f"{case}/{line_count}"] = result
+            rss = f"{result['peak_rss_mb']:.1f} МБ" if result["peak_rss_mb"] is not None else "н/д"
+            print(
+                f"{case:>8} {line_count:>8} строк: {result['seconds']:.4f} с, "
+                f"{result['items_per_sec']:.0f} эл./с, пик памяти {rss}"
+            )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
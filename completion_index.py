@@ -0,0 +1,148 @@
+"""Индекс подсказок по фирмам и продуктам для быстрого ввода заказа.
+
+Значения хранятся в отсортированных массивах, поиск по префиксу
+выполняется через bisect. Индекс сохраняется на диск и при запуске
+загружается готовым, без повторного построения.
+"""
+import json
+import os
+from bisect import bisect_left
+
+DEFAULT_INDEX_PATH = "completion_index.json"
+# Сколько подсказок показывать
+SUGGESTION_LIMIT = 20
+# Начиная с такого размера порции новые значения вливаются слиянием, а не вставкой по одному
+MERGE_THRESHOLD = 64
+
+
+class PrefixIndex:
+    """Отсортированный набор строк без учёта регистра с поиском по префиксу."""
+
+    def __init__(self, values=()):
+        self._keys = []  # Значения в casefold, отсортированы
+        self._values = []  # Исходные значения в том же порядке
+        self.add_many(values)
+
+    @classmethod
+    def from_sorted(cls, values):
+        """Индекс из уже отсортированных уникальных значений (как их сохраняет values())."""
+        index = cls()
+        index._values = list(values)
+        index._keys = [value.casefold() for value in index._values]
+        return index
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, value):
+        key = value.strip().casefold()
+        position = bisect_left(self._keys, key)
+        return position < len(self._keys) and self._keys[position] == key
+
+    def add(self, value):
+        """Добавить значение; возвращает True, если оно новое."""
+        value = value.strip()
+        if not value:
+            return False
+        key = value.casefold()
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return False
+        self._keys.insert(position, key)
+        self._values.insert(position, value)
+        return True
+
+    def add_many(self, values):
+        """Добавить несколько значений; возвращает число новых."""
+        new_items = {}
+        for value in values:
+            value = value.strip()
+            if value and value not in self:
+                new_items.setdefault(value.casefold(), value)
+        if len(new_items) < MERGE_THRESHOLD:
+            for value in new_items.values():
+                self.add(value)
+            return len(new_items)
+        merged = sorted(list(zip(self._keys, self._values)) + list(new_items.items()))
+        self._keys = [key for key, _value in merged]
+        self._values = [value for _key, value in merged]
+        return len(new_items)
+
+    def suggest(self, prefix, limit=SUGGESTION_LIMIT):
+        """Значения, начинающиеся с prefix (без учёта регистра), не более limit."""
+        key = prefix.strip().casefold()
+        if not key:
+            return []
+        position = bisect_left(self._keys, key)
+        result = []
+        while position < len(self._keys) and len(result) < limit and self._keys[position].startswith(key):
+            result.append(self._values[position])
+            position += 1
+        return result
+
+    def values(self):
+        return list(self._values)
+
+
+class CompletionIndex:
+    """Подсказки по фирмам и названиям продуктов со всех загруженных и сохранённых заказов."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.companies = PrefixIndex()
+        self.products = PrefixIndex()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, database_path=None):
+        """Загрузить индекс с диска.
+
+        Если файла ещё нет, индекс строится по базе заказов (если она есть)
+        и сохраняется.
+        """
+        index = cls(path)
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            if database_path and os.path.exists(database_path):
+                from order_db import OrderDatabase
+
+                with OrderDatabase(database_path) as database:
+                    index.add_from_database(database)
+                index.save()
+            return index
+        index.companies = PrefixIndex.from_sorted(data.get("companies", []))
+        index.products = PrefixIndex.from_sorted(data.get("products", []))
+        return index
+
+    def save(self):
+        """Записать индекс на диск, если он изменился."""
+        if not self.dirty and os.path.exists(self.path):
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"companies": self.companies.values(), "products": self.products.values()},
+                      file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def add_company(self, company):
+        if self.companies.add(company):
+            self.dirty = True
+
+    def add_products(self, names):
+        if self.products.add_many(names):
+            self.dirty = True
+
+    def add_order(self, order):
+        """Учесть фирму и продукты заказа (Order)."""
+        self.add_company(order.company)
+        self.add_products(line.name for line in order.lines)
+
+    def add_from_database(self, database):
+        """Заполнить индекс по всем заказам базы (OrderDatabase)."""
+        connection = database.connection
+        self.companies.add_many(row[0] for row in connection.execute("SELECT DISTINCT company FROM orders"))
+        self.products.add_many(row[0] for row in connection.execute("SELECT DISTINCT name FROM order_lines"))
+        self.dirty = True
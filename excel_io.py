@@ -0,0 +1,134 @@
+"""Чтение и запись заказов в Excel."""
+from itertools import chain, islice
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+from order_core import INFO_FIELDS, ORDER_HEADERS, Order, OrderLine
+
+# Количество строк, передаваемых в таблицу за один раз
+IMPORT_CHUNK_SIZE = 5000
+# Как часто (в строках) сообщать о ходе сохранения
+PROGRESS_STEP = 1000
+
+
+def iter_sheet_rows(file_path):
+    """Построчно читать активный лист в режиме read_only.
+
+    Книга закрывается, когда генератор исчерпан или удалён.
+    """
+    return _iter_rows(openpyxl.load_workbook(file_path, read_only=True, data_only=True))
+
+
+def _iter_rows(workbook):
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _chunked(lines, chunk_size):
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_order(file_path, chunk_size=IMPORT_CHUNK_SIZE):
+    """Открыть файл заказа.
+
+    Возвращает Order с полями шапки (без строк), генератор порций OrderLine
+    и примерное число строк на листе для индикатора хода загрузки (0, если
+    в файле не записаны размеры листа, как у книг режима write_only).
+    Понимает формат "Сохранить в Excel" (заголовок Serial, шапка во второй
+    строке, продукты со столбца H) и простой список, где в A1-A3 указаны
+    фирма, ответственное лицо и телефон, а продукты идут со второй строки.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    total_rows = workbook.active.max_row or 0
+    rows = _iter_rows(workbook)
+    first = next(rows, None) or ()
+
+    if first and first[0] == ORDER_HEADERS[0]:
+        offset = len(INFO_FIELDS)
+        order = Order.from_info_row(next(rows, None) or ())
+        lines = (OrderLine.from_row(row[offset:]) for row in rows)
+    else:
+        # Поля шапки берутся из A1-A3, продукты начинаются со второй строки
+        head = list(islice(rows, 2))
+        order = Order()
+        for field, row in zip(("company", "responsible", "phone"), [first] + head):
+            value = row[0] if row else None
+            setattr(order, field, "" if value is None else str(value))
+        lines = (OrderLine.from_row(row) for row in chain(head, rows))
+
+    return order, _chunked((line for line in lines if line is not None), chunk_size), total_rows
+
+
+def _order_styles():
+    """Именованные стили отчёта, создаются один раз на книгу."""
+    border_side = Side(style="thin")
+    centered = Alignment(horizontal="center", vertical="center")
+    header_style = NamedStyle(
+        name="order_header",
+        font=Font(bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+        alignment=centered
+    )
+    info_style = NamedStyle(
+        name="order_info",
+        alignment=centered,
+        border=Border(left=border_side, right=border_side, top=border_side, bottom=border_side)
+    )
+    return header_style, info_style
+
+
+def _styled_cells(sheet, values, style):
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.style = style
+        cells.append(cell)
+    return cells
+
+
+def write_order(file_path, order, progress=None, is_cancelled=None):
+    """Сохранить заказ в Excel с форматированием.
+
+    Книга пишется в режиме write_only за один проход по order.lines, поэтому
+    память не растёт с числом строк (lines может быть генератором).
+    progress(сделано, всего) вызывается каждые PROGRESS_STEP строк.
+    Если is_cancelled() вернёт True, файл не сохраняется и функция
+    возвращает False.
+    """
+    lines = order.lines
+    total = len(lines) if hasattr(lines, "__len__") else 0
+    workbook = openpyxl.Workbook(write_only=True)
+    header_style, info_style = _order_styles()
+    workbook.add_named_style(header_style)
+    workbook.add_named_style(info_style)
+    sheet = workbook.create_sheet()
+
+    sheet.append(_styled_cells(sheet, ORDER_HEADERS, header_style.name))
+
+    # Основная информация: ячейки создаются один раз и повторяются в каждой строке,
+    # write_only лист сериализует их сразу при добавлении строки
+    info_cells = _styled_cells(sheet, order.info_row(), info_style.name)
+    sheet.append(info_cells)
+
+    written = 0
+    for line in lines:
+        if is_cancelled and is_cancelled():
+            workbook.close()
+            return False
+        sheet.append(info_cells + line.to_row())  # Продуктовые данные со столбца H
+        written += 1
+        if progress and written % PROGRESS_STEP == 0:
+            progress(written, max(total, written))
+
+    workbook.save(file_path)
+    if progress:
+        progress(written, max(total, written))
+    return True
@@ -0,0 +1,135 @@
+"""Хранилище изображений по хешу содержимого.
+
+Каждый файл хранится один раз под именем <sha1><расширение>, число заказов,
+ссылающихся на файл, учитывается в базе SQLite images.db в той же папке.
+Счётчики меняются в транзакции с блокировкой базы, поэтому несколько
+запущенных копий программы не теряют ссылки друг друга. Файл удаляется,
+когда на него не остаётся ссылок; файл с неизвестным числом ссылок
+не удаляется никогда.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+from contextlib import contextmanager
+
+DATABASE_FILE_NAME = "images.db"
+# Размер блока при чтении файла для хеширования
+HASH_BLOCK_SIZE = 1 << 20
+# Сколько секунд ждать, пока другая копия программы держит базу
+LOCK_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source_key TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_name ON sources (name);
+"""
+
+
+def file_digest(file_path):
+    """SHA-1 содержимого файла (шестнадцатеричная строка)."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """Дедуплицированное хранилище изображений с подсчётом ссылок."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        # Транзакции открываются явно (BEGIN IMMEDIATE), см. _transaction
+        self.connection = sqlite3.connect(
+            os.path.join(folder, DATABASE_FILE_NAME), timeout=LOCK_TIMEOUT, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция с блокировкой записи на всё время чтения и изменения счётчиков."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    @staticmethod
+    def _source_key(file_path):
+        stat = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def path_for(self, name):
+        """Полный путь к файлу хранилища."""
+        return os.path.join(self.folder, name)
+
+    @staticmethod
+    def digest_of(stored_path):
+        """Хеш содержимого по пути к файлу хранилища."""
+        return os.path.splitext(os.path.basename(stored_path))[0]
+
+    def add(self, file_path):
+        """Добавить файл в хранилище и вернуть путь к сохранённой копии.
+
+        Уже известный исходный файл (тот же путь, размер и время изменения)
+        не читается повторно; файл с уже сохранённым содержимым не копируется.
+        """
+        source_key = self._source_key(file_path)
+        row = self.connection.execute("SELECT name FROM sources WHERE source_key = ?", (source_key,)).fetchone()
+        # Хеш считается до блокировки базы, чтобы не задерживать другие копии программы
+        name = row[0] if row else file_digest(file_path) + os.path.splitext(file_path)[1].lower()
+        stored_path = self.path_for(name)
+        with self._transaction() as connection:
+            # Проверка и копирование под блокировкой: release другой копии не удалит файл между ними
+            if not os.path.exists(stored_path):
+                temp_path = stored_path + ".tmp"
+                shutil.copyfile(file_path, temp_path)
+                os.replace(temp_path, stored_path)
+            connection.execute("INSERT OR REPLACE INTO sources (source_key, name) VALUES (?, ?)", (source_key, name))
+            connection.execute(
+                "INSERT INTO refs (name, count) VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET count = count + 1",
+                (name,)
+            )
+        return stored_path
+
+    def release(self, stored_path):
+        """Снять одну ссылку на файл; файл удаляется, когда ссылок не остаётся.
+
+        Файл, ссылки на который не учтены в базе, не удаляется. Возвращает
+        True, если файл был удалён.
+        """
+        name = os.path.basename(stored_path)
+        with self._transaction() as connection:
+            row = connection.execute("SELECT count FROM refs WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                print(f"Число ссылок на изображение {name} неизвестно, файл оставлен")
+                return False
+            if row[0] > 1:
+                connection.execute("UPDATE refs SET count = count - 1 WHERE name = ?", (name,))
+                return False
+            connection.execute("DELETE FROM refs WHERE name = ?", (name,))
+            connection.execute("DELETE FROM sources WHERE name = ?", (name,))
+            path = self.path_for(name)
+            if os.path.exists(path):
+                os.remove(path)
+                return True
+        return False
+
+    def release_all(self, stored_paths):
+        """Снять по одной ссылке на каждый файл из списка."""
+        for stored_path in stored_paths:
+            self.release(stored_path)
@@ -0,0 +1,282 @@
+"""Замер времени, числа строк и памяти для операций приложения.
+
+Каждая операция записывается в журнал JSON (по одной записи в строке,
+с ротацией файлов) и передаётся подписчикам, например панели отладки.
+Для подробной диагностики сеанс можно запустить под cProfile и tracemalloc.
+Время запуска приложения записывается по фазам (StartupTimer). Частые
+короткие операции (пересчёт итога при каждой правке) записываются сводкой
+за интервал SAMPLE_INTERVAL (record_sample).
+"""
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+LOG_FOLDER = "logs"
+LOG_FILE_NAME = "instrumentation.jsonl"
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUP_COUNT = 5
+PROFILE_FILE_NAME = "profile.pstats"
+# Сколько строк статистики tracemalloc записывать в журнал при завершении
+TRACEMALLOC_TOP = 20
+# За сколько секунд частая операция записывается одной сводкой
+SAMPLE_INTERVAL = 5.0
+
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class _ProcessMemoryCounters(ctypes.Structure):
+        """PROCESS_MEMORY_COUNTERS из psapi.h."""
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32")
+    _kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    _psapi = ctypes.WinDLL("psapi")
+    _psapi.GetProcessMemoryInfo.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(_ProcessMemoryCounters), wintypes.DWORD
+    ]
+    _psapi.GetProcessMemoryInfo.restype = wintypes.BOOL
+
+    def current_rss_bytes():
+        """Текущий размер рабочего набора процесса (None, если недоступно)."""
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not _psapi.GetProcessMemoryInfo(_kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+else:
+    def current_rss_bytes():
+        """Текущий размер резидентной памяти процесса (None, если недоступно)."""
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+
+class Span:
+    """Выполняющаяся операция; завершается вызовом finish()."""
+
+    def __init__(self, instrumentation, name, memory=True):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.memory = memory
+        self.rows = None
+        self._rss_before = current_rss_bytes() if memory else None
+        self._traced_before = tracemalloc.get_traced_memory()[0] if memory and tracemalloc.is_tracing() else None
+        self._started = time.perf_counter()
+
+    def finish(self, rows=None, error=None):
+        duration = time.perf_counter() - self._started
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "operation": self.name,
+            "duration_ms": round(duration * 1000, 3),
+            "rows": rows if rows is not None else self.rows,
+        }
+        if self._rss_before is not None:
+            rss_after = current_rss_bytes()
+            record["rss_delta_kb"] = (rss_after - self._rss_before) // 1024 if rss_after is not None else None
+        if self._traced_before is not None and tracemalloc.is_tracing():
+            record["traced_delta_kb"] = (tracemalloc.get_traced_memory()[0] - self._traced_before) // 1024
+        if error is not None:
+            record["error"] = str(error)
+        self.instrumentation.record(record)
+        return record
+
+
+class StartupTimer:
+    """Время фаз запуска приложения; каждая фаза записывается как операция startup.<фаза>."""
+
+    def __init__(self, instrumentation, started=None):
+        self.instrumentation = instrumentation
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []  # (фаза, мс) в порядке выполнения
+
+    @contextmanager
+    def phase(self, name):
+        """Замерить фазу запуска: with startup.phase("имя"): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        """Записать фазу, длительность которой замерена отдельно."""
+        record = self.instrumentation.record_duration(f"startup.{name}", seconds)
+        self.phases.append((name, record["duration_ms"]))
+
+    def finish(self):
+        """Записать общее время запуска и вернуть его в мс."""
+        total = time.perf_counter() - self.started
+        self.add("total", total)
+        return self.phases[-1][1]
+
+    def report(self):
+        """Текстовая сводка по фазам запуска."""
+        return "\n".join(f"{name:>20}: {duration_ms:9.1f} мс" for name, duration_ms in self.phases)
+
+
+class Instrumentation:
+    """Сбор статистики операций."""
+
+    def __init__(self):
+        self._listeners = []  # Заменяется целиком, record() перебирает его без блокировки
+        self._lock = threading.Lock()
+        self._logger = None
+        self._profiler = None
+        self._samples = {}  # Частая операция -> сводка текущего интервала
+        self.totals = {}  # Операция -> {"count", "total_ms", "last"}
+
+    def configure_log(self, folder=LOG_FOLDER):
+        """Включить запись в журнал JSON с ротацией."""
+        os.makedirs(folder, exist_ok=True)
+        logger = logging.getLogger("pl_hesablama.instrumentation")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = RotatingFileHandler(
+            os.path.join(folder, LOG_FILE_NAME), maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        logger.addHandler(handler)
+        self._logger = logger
+
+    def add_listener(self, callback):
+        """Подписаться на записи; callback вызывается в потоке, где завершилась операция."""
+        with self._lock:
+            self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback):
+        """Отменить подписку add_listener."""
+        with self._lock:
+            self._listeners = [listener for listener in self._listeners if listener is not callback]
+
+    def start(self, name, memory=True):
+        """Начать замер операции (например, фоновой) и вернуть Span."""
+        return Span(self, name, memory)
+
+    def startup_timer(self, started=None):
+        """StartupTimer для замера фаз запуска (started - время начала по time.perf_counter())."""
+        return StartupTimer(self, started)
+
+    @contextmanager
+    def measure(self, name, memory=True):
+        """Замерить блок кода: with instrumentation.measure("имя") as span: ..."""
+        span = self.start(name, memory)
+        try:
+            yield span
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        span.finish()
+
+    def record_duration(self, name, seconds, rows=None):
+        """Записать операцию, длительность которой замерена отдельно (например, задержку очереди)."""
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "operation": name,
+            "duration_ms": round(seconds * 1000, 3),
+            "rows": rows,
+        }
+        self.record(record)
+        return record
+
+    def record_sample(self, name, seconds, rows=None):
+        """Учесть один вызов частой операции.
+
+        Вызовы копятся в сводку, которая записывается (в журнал и подписчикам)
+        не чаще раза в SAMPLE_INTERVAL секунд: duration_ms - среднее время,
+        count - число вызовов, max_ms - самый долгий вызов.
+        """
+        now = time.monotonic()
+        with self._lock:
+            sample = self._samples.get(name)
+            if sample is None:
+                sample = self._samples[name] = {"started": now, "count": 0, "total": 0.0, "max": 0.0}
+            sample["count"] += 1
+            sample["total"] += seconds
+            sample["max"] = max(sample["max"], seconds)
+            sample["rows"] = rows
+            if now - sample["started"] < SAMPLE_INTERVAL:
+                return
+            del self._samples[name]
+        self._record_sample(name, sample)
+
+    def flush_samples(self):
+        """Записать сводки частых операций, не дождавшиеся конца интервала."""
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        for name, sample in samples.items():
+            self._record_sample(name, sample)
+
+    def _record_sample(self, name, sample):
+        self.record({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "operation": name,
+            "duration_ms": round(sample["total"] / sample["count"] * 1000, 3),
+            "rows": sample["rows"],
+            "count": sample["count"],
+            "max_ms": round(sample["max"] * 1000, 3),
+        })
+
+    def record(self, record):
+        count = record.get("count", 1)  # Сводка record_sample учитывает несколько вызовов
+        with self._lock:
+            stats = self.totals.setdefault(record["operation"], {"count": 0, "total_ms": 0.0, "last": None})
+            stats["count"] += count
+            stats["total_ms"] += record["duration_ms"] * count
+            stats["last"] = record
+            listeners = self._listeners
+        if self._logger is not None:
+            self._logger.info(json.dumps(record, ensure_ascii=False))
+        for callback in listeners:
+            callback(record)
+
+    def start_session_profiling(self, profile=False, trace_memory=False):
+        """Запустить cProfile и/или tracemalloc на весь сеанс."""
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop_session_profiling(self, folder=LOG_FOLDER):
+        """Сохранить результаты профилирования сеанса в папку журнала."""
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(folder, exist_ok=True)
+            self._profiler.dump_stats(os.path.join(folder, PROFILE_FILE_NAME))
+            self._profiler = None
+        if tracemalloc.is_tracing():
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TRACEMALLOC_TOP]
+            if self._logger is not None:
+                self._logger.info(json.dumps({
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "operation": "tracemalloc",
+                    "top": [str(statistic) for statistic in top],
+                }, ensure_ascii=False))
+            tracemalloc.stop()
+
+
+# Общий экземпляр приложения
+instrumentation = Instrumentation()
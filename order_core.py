@@ -0,0 +1,208 @@
+"""Данные и расчёты заказа, не зависящие от Qt.
+
+Здесь описаны структуры Order/OrderLine, расчёт итогов, схема серийных
+номеров и соответствие между заказом и строками файла Excel.
+"""
+import math
+
+# Заголовки файла, который создаёт "Сохранить в Excel"
+ORDER_HEADERS = [
+    "Serial", "Фирма", "Ответственное лицо", "Телефон", "Дата начала",
+    "Дата окончания", "Адрес", "Название продукта", "Ед. изм.", "Кол-во",
+    "Цена", "Сумма", "Примечание"
+]
+# Поля шапки заказа в порядке столбцов
+INFO_FIELDS = ["serial", "company", "responsible", "phone", "start_date", "end_date", "address"]
+# Серийный номер, если он не указан
+DEFAULT_SERIAL = "1111"
+# Через сколько инкрементальных изменений итог пересчитывается заново,
+# чтобы не накапливалась погрешность вычислений с плавающей точкой
+RESYNC_INTERVAL = 4096
+
+
+def safe_fsum(values):
+    """Точная сумма math.fsum; если промежуточная сумма переполняется, - обычная сумма (inf)."""
+    if not hasattr(values, "__len__"):
+        values = list(values)  # Генератор понадобится второй раз
+    try:
+        return math.fsum(values)
+    except OverflowError:
+        return sum(values, 0.0)
+
+
+class RunningTotal:
+    """Нарастающий итог по строкам заказа.
+
+    При редактировании строки учитывается только разница между старой
+    и новой суммой строки, поэтому обновление итога занимает O(1).
+    """
+
+    __slots__ = ("_subtotal", "_pending")
+
+    def __init__(self, subtotal=0.0):
+        self._subtotal = subtotal
+        self._pending = 0
+
+    @property
+    def subtotal(self):
+        """Сумма по всем строкам без комиссии."""
+        return self._subtotal
+
+    @property
+    def needs_resync(self):
+        """True, если итог пора пересчитать полностью."""
+        return self._pending >= RESYNC_INTERVAL
+
+    def reset(self, row_sums=()):
+        """Пересчитать итог заново по суммам всех строк."""
+        self._subtotal = safe_fsum(row_sums)
+        self._pending = 0
+
+    def _count_change(self):
+        self._pending += 1
+        if not math.isfinite(self._subtotal):
+            # inf/nan не вычитается обратно: итог нужно пересчитать сразу
+            self._pending = RESYNC_INTERVAL
+
+    def replace(self, old_sum, new_sum):
+        """Учесть изменение суммы одной строки."""
+        self._subtotal += new_sum - old_sum
+        self._count_change()
+
+    def add(self, row_sums):
+        """Учесть добавление строк с указанными суммами."""
+        self._subtotal += safe_fsum(row_sums)
+        self._count_change()
+
+    def remove(self, row_sums):
+        """Учесть удаление строк с указанными суммами."""
+        self._subtotal -= safe_fsum(row_sums)
+        self._count_change()
+
+
+def parse_number(value):
+    """Преобразовать текст ячейки в число (пустое, некорректное или бесконечное значение -> 0)."""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip().replace(",", ".")
+        if not text:
+            return 0.0
+        try:
+            number = float(text)
+        except ValueError:
+            return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+def format_number(value):
+    """Форматирование числа для отображения без лишних нулей."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+class OrderLine:
+    """Строка продукта в заказе."""
+
+    __slots__ = ("name", "unit", "quantity", "price", "note")
+
+    def __init__(self, name="", unit="", quantity=0.0, price=0.0, note=""):
+        self.name = name
+        self.unit = unit
+        self.quantity = quantity
+        self.price = price
+        self.note = note
+
+    @property
+    def amount(self):
+        """Сумма строки."""
+        return self.quantity * self.price
+
+    def to_row(self):
+        """Значения строки в текстовом виде по столбцам таблицы продуктов."""
+        return [
+            self.name, self.unit, format_number(self.quantity),
+            format_number(self.price), f"{self.amount:.2f}", self.note
+        ]
+
+    @classmethod
+    def from_row(cls, values):
+        """Строка из значений ячеек (название, ед. изм., кол-во, цена, сумма, примечание).
+
+        Возвращает None для пустой строки. Сумма не читается: она
+        пересчитывается по количеству и цене.
+        """
+        values = list(values[:6])
+        if all(value in (None, "") for value in values):
+            return None
+        values += [None] * (6 - len(values))
+        name, unit, quantity, price, _amount, note = values
+        return cls(_text(name), _text(unit), parse_number(quantity), parse_number(price), _text(note))
+
+    def __eq__(self, other):
+        if not isinstance(other, OrderLine):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"OrderLine({self.name!r}, {self.unit!r}, {self.quantity!r}, {self.price!r}, {self.note!r})"
+
+
+class Order:
+    """Заказ: поля шапки (см. INFO_FIELDS) и строки продуктов.
+
+    lines может быть списком или любым итерируемым набором OrderLine,
+    например генератором при потоковом чтении/записи.
+    """
+
+    __slots__ = tuple(INFO_FIELDS) + ("lines",)
+
+    def __init__(self, serial="", company="", responsible="", phone="",
+                 start_date="", end_date="", address="", lines=()):
+        self.serial = serial
+        self.company = company
+        self.responsible = responsible
+        self.phone = phone
+        self.start_date = start_date
+        self.end_date = end_date
+        self.address = address
+        self.lines = lines
+
+    @classmethod
+    def from_info_row(cls, values):
+        """Заказ без строк по значениям столбцов шапки."""
+        return cls(*map(_text, list(values[:len(INFO_FIELDS)])))
+
+    def info(self):
+        """Поля шапки в виде словаря."""
+        return {field: getattr(self, field) for field in INFO_FIELDS}
+
+    def info_row(self):
+        """Значения столбцов шапки для строки Excel (с серийным номером по умолчанию)."""
+        return [order_serial(self.serial)] + [getattr(self, field) for field in INFO_FIELDS[1:]]
+
+
+def order_serial(serial):
+    """Серийный номер заказа или номер по умолчанию."""
+    return serial or DEFAULT_SERIAL
+
+
+def line_serial(serial, index):
+    """Серийный номер строки: первая строка - номер заказа, следующие - с суффиксом -1, -2, ..."""
+    serial = order_serial(serial)
+    return serial if index == 0 else f"{serial}-{index}"
+
+
+def order_subtotal(lines):
+    """Сумма по строкам без комиссии."""
+    return safe_fsum(line.amount for line in lines)
+
+
+def total_with_commission(subtotal, commission_percent):
+    """Итоговая сумма с учетом комиссии в процентах."""
+    return subtotal * (1 + commission_percent / 100)
@@ -0,0 +1,173 @@
+"""Локальная база заказов SQLite.
+
+Заказы хранятся так же, как их записывает "Сохранить в Excel": шапка
+в таблице orders, строки продуктов с серийными номерами строк в order_lines.
+Excel остаётся форматом обмена, поиск выполняется по индексам базы.
+"""
+import datetime
+import sqlite3
+
+from order_core import DEFAULT_SERIAL, INFO_FIELDS, Order, OrderLine, line_serial, order_serial
+
+DEFAULT_DB_PATH = "orders.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    serial TEXT NOT NULL,
+    company TEXT NOT NULL,
+    responsible TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    address TEXT NOT NULL,
+    saved_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    line_serial TEXT NOT NULL,
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    amount REAL NOT NULL,
+    note TEXT NOT NULL,
+    PRIMARY KEY (order_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_orders_serial ON orders(serial);
+CREATE INDEX IF NOT EXISTS idx_orders_company ON orders(company);
+CREATE INDEX IF NOT EXISTS idx_orders_start_date ON orders(start_date);
+CREATE INDEX IF NOT EXISTS idx_orders_end_date ON orders(end_date);
+"""
+
+# Форматы дат, в которых они приходят из формы и файлов Excel
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d %b %Y", "%d/%m/%Y")
+
+
+def iso_date(text):
+    """Дата в формате ГГГГ-ММ-ДД для сортировки и поиска (нераспознанный текст - как есть)."""
+    text = (text or "").strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text[:11].strip(), date_format).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+
+class OrderDatabase:
+    """Хранилище заказов с индексами по серийному номеру, фирме и датам.
+
+    Соединение нельзя передавать между потоками: фоновая задача открывает
+    свой экземпляр.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def save_order(self, order):
+        """Сохранить заказ со строками и вернуть его id."""
+        return self.save_orders([order])[0]
+
+    def save_orders(self, orders):
+        """Сохранить несколько заказов одной транзакцией; строки вставляются через executemany.
+
+        Заказ с введённым серийным номером, который уже есть в базе,
+        заменяется (шапка и все строки) и сохраняет свой id. Заказы без
+        номера (номер по умолчанию) всегда добавляются новыми.
+        """
+        saved_at = datetime.datetime.now().isoformat(timespec="seconds")
+        order_ids = []
+        with self.connection:
+            for order in orders:
+                values = order.info()
+                values["serial"] = order_serial(order.serial)
+                values["start_date"] = iso_date(order.start_date)
+                values["end_date"] = iso_date(order.end_date)
+                row = None
+                if order.serial and order.serial != DEFAULT_SERIAL:
+                    row = self.connection.execute(
+                        "SELECT id FROM orders WHERE serial = ? ORDER BY id DESC LIMIT 1", (order.serial,)
+                    ).fetchone()
+                if row is None:
+                    order_id = self.connection.execute(
+                        f"INSERT INTO orders ({', '.join(INFO_FIELDS)}, saved_at) "
+                        f"VALUES ({', '.join('?' * len(INFO_FIELDS))}, ?)",
+                        [values[field] for field in INFO_FIELDS] + [saved_at]
+                    ).lastrowid
+                else:
+                    order_id = row[0]
+                    self.connection.execute(
+                        f"UPDATE orders SET {', '.join(f'{field} = ?' for field in INFO_FIELDS)}, saved_at = ? "
+                        "WHERE id = ?",
+                        [values[field] for field in INFO_FIELDS] + [saved_at, order_id]
+                    )
+                    self.connection.execute("DELETE FROM order_lines WHERE order_id = ?", (order_id,))
+                self.connection.executemany(
+                    "INSERT INTO order_lines (order_id, position, line_serial, name, unit, "
+                    "quantity, price, amount, note) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (order_id, position, line_serial(values["serial"], position), line.name,
+                         line.unit, line.quantity, line.price, line.amount, line.note)
+                        for position, line in enumerate(order.lines)
+                    )
+                )
+                order_ids.append(order_id)
+        return order_ids
+
+    def _find(self, where, parameters):
+        rows = self.connection.execute(
+            f"SELECT id, {', '.join(INFO_FIELDS)} FROM orders WHERE {where} ORDER BY start_date, id",
+            parameters
+        )
+        return [(row[0], Order(*row[1:])) for row in rows]
+
+    def find_by_serial(self, serial):
+        """Заказы с указанным серийным номером: список (id, Order без строк)."""
+        return self._find("serial = ?", (serial,))
+
+    def find_by_company(self, company):
+        """Заказы фирмы: список (id, Order без строк)."""
+        return self._find("company = ?", (company,))
+
+    def find_by_dates(self, start_date, end_date):
+        """Заказы, начавшиеся в указанном интервале дат (включительно)."""
+        return self._find("start_date BETWEEN ? AND ?", (iso_date(start_date), iso_date(end_date)))
+
+    def load_order(self, order_id):
+        """Заказ со всеми строками или None, если его нет."""
+        row = self.connection.execute(
+            f"SELECT {', '.join(INFO_FIELDS)} FROM orders WHERE id = ?", (order_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        order = Order(*row)
+        order.lines = [
+            OrderLine(*line) for line in self.connection.execute(
+                "SELECT name, unit, quantity, price, note FROM order_lines "
+                "WHERE order_id = ? ORDER BY position", (order_id,)
+            )
+        ]
+        return order
+
+    def import_workbook(self, file_path):
+        """Перенести заказ из файла Excel в базу и вернуть его id."""
+        from excel_io import read_order  # openpyxl нужен только для импорта книг
+
+        order, chunks, _total_rows = read_order(file_path)
+        order.lines = [line for chunk in chunks for line in chunk]
+        return self.save_order(order)
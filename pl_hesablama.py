@@ -1,23 +1,47 @@
+import time
+
+# Начало загрузки модуля, от него отсчитывается время запуска
+IMPORT_STARTED = time.perf_counter()
+
 import sys
 import os
+from array import array
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QGridLayout, QLineEdit, QLabel,
-    QTableWidget, QTableWidgetItem, QPushButton, QDateEdit, QComboBox,
-    QWidget, QFileDialog, QHBoxLayout, QSpinBox, QScrollArea, QFrame, QGraphicsPixmapItem, QGraphicsView, QGraphicsScene
+    QTableView, QPushButton, QDateEdit, QComboBox,
+    QWidget, QFileDialog, QHBoxLayout, QSpinBox,
+    QProgressBar, QListView, QAbstractItemView, QCompleter, QDockWidget, QTableWidget,
+    QTableWidgetItem, QShortcut, QTabBar, QInputDialog
 )
-from PyQt5.QtCore import Qt, QDate
-from PyQt5.QtGui import QPixmap
-import openpyxl
-import datetime
-import subprocess
-from PyQt5.QtGui import QIcon
-from openpyxl.styles import Alignment, Font, Border, Side
-from PyQt5.QtGui import QDoubleValidator
+from PyQt5.QtCore import (
+    Qt, QDate, QAbstractTableModel, QModelIndex, QThreadPool, QSize, QStringListModel, QSettings, QTimer,
+    pyqtSignal
+)
+from PyQt5.QtGui import QDoubleValidator, QKeySequence
 from PyQt5.QtWidgets import QStyledItemDelegate, QLineEdit
+from order_core import INFO_FIELDS, Order, OrderLine, RunningTotal, format_number, parse_number, total_with_commission
+# openpyxl (через workers), изображения и AutoCAD импортируются при первом использовании
+from workers import LoadExcelJob, OpenCatalogJob, ReplayJournalJob, SaveExcelJob
+from autosave import (
+    AUTOSAVE_FOLDER, CLEARED_FOLDER, OrderJournal, claim_journal, journal_paths, line_values, new_journal_path
+)
+from completion_index import CompletionIndex
+from instrumentation import instrumentation
 
 
 # Глобальные константы
 IMAGES_FOLDER = "images/"
+THUMBNAILS_FOLDER = os.path.join(IMAGES_FOLDER, ".thumbnails")
+ORDERS_DB_PATH = "orders.db"
+COMPLETION_INDEX_PATH = "completion_index.json"
+OUTBOX_PATH = "outbox.db"
+DEFAULT_COMMISSION = 15
+# Формат дат заказа в Excel и журналах (не зависит от языка системы, в отличие от QDateEdit.text())
+DATE_FORMAT = "dd.MM.yyyy"
+
+# Столбцы таблицы продуктов
+PRODUCT_HEADERS = ["Название продукта", "Ед. изм.", "Кол-во", "Цена", "Сумма", "Примечание"]
+COL_NAME, COL_UNIT, COL_QTY, COL_PRICE, COL_SUM, COL_NOTE = range(len(PRODUCT_HEADERS))
 
 class NumericDelegate(QStyledItemDelegate):
     """Делегат для ограничения ввода только числами."""
@@ -32,36 +56,659 @@ class NumericDelegate(QStyledItemDelegate):
         editor.setValidator(validator)
         return editor
 
+def attach_completer(line_edit, prefix_index):
+    """Подключить к полю ввода подсказки из PrefixIndex.
+
+    Модель QCompleter содержит только найденные по префиксу значения и
+    обновляется при каждом нажатии клавиши.
+    """
+    suggestions = QStringListModel(line_edit)
+    completer = QCompleter(suggestions, line_edit)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    line_edit.setCompleter(completer)
+
+    def update_suggestions(text):
+        suggestions.setStringList(prefix_index.suggest(text))
+        completer.setCompletionPrefix(text)
+        if suggestions.rowCount():
+            completer.complete()
+
+    line_edit.textEdited.connect(update_suggestions)
+    return completer
+
+
+class CompleterDelegate(QStyledItemDelegate):
+    """Делегат для ввода текста с подсказками (названия продуктов)."""
+    def __init__(self, prefix_index, parent=None):
+        super().__init__(parent)
+        self.prefix_index = prefix_index
+
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        attach_completer(editor, self.prefix_index)
+        return editor
+
+
+class TableState:
+    """Компактный снимок строк таблицы: списки и массивы модели без копирования."""
+    __slots__ = ("names", "units", "notes", "quantities", "prices", "sums", "totals")
+
+    def __init__(self, names, units, notes, quantities, prices, sums, totals):
+        self.names = names
+        self.units = units
+        self.notes = notes
+        self.quantities = quantities
+        self.prices = prices
+        self.sums = sums
+        self.totals = totals
+
+    @classmethod
+    def from_columns(cls, names, units, notes, quantities, prices):
+        """TableState из столбцов значений (копирует их)."""
+        quantities = array("d", quantities)
+        prices = array("d", prices)
+        sums = array("d", map(float.__mul__, quantities, prices))
+        totals = RunningTotal()
+        totals.reset(sums)
+        return cls(list(names), list(units), list(notes), quantities, prices, sums, totals)
+
+
+class OrderSnapshot:
+    """Данные неактивной вкладки заказа.
+
+    Строки таблицы хранятся в виде TableState, а строки, загруженные в фоне,
+    пока вкладка неактивна, - в pending_lines до её открытия.
+    """
+    __slots__ = ("order", "table_state", "pending_lines", "commission", "images")
+
+    def __init__(self, order=None, table_state=None, commission=DEFAULT_COMMISSION, images=()):
+        self.order = order or Order()
+        self.table_state = table_state
+        self.pending_lines = []
+        self.commission = commission
+        self.images = list(images)
+
+
+class OrderTableModel(QAbstractTableModel):
+    """Модель строк заказа.
+
+    Текстовые столбцы хранятся в списках, а количество, цена и сумма -
+    в компактных массивах array('d'), поэтому пересчёт не создаёт объектов
+    на каждую ячейку. Итог ведётся инкрементально через RunningTotal.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+        self._units = []
+        self._notes = []
+        self._quantities = array("d")
+        self._prices = array("d")
+        self._sums = array("d")
+        self._totals = RunningTotal()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(PRODUCT_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return PRODUCT_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() != COL_SUM:
+            flags |= Qt.ItemIsEditable  # "Сумма" только для чтения
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        return self.cell_text(index.row(), index.column())
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row, col = index.row(), index.column()
+        if col == COL_SUM:
+            return False
+        if col in (COL_QTY, COL_PRICE):
+            number = parse_number(value)
+            if col == COL_QTY:
+                self._quantities[row] = number
+            else:
+                self._prices[row] = number
+            old_sum = self._sums[row]
+            self._sums[row] = self._quantities[row] * self._prices[row]
+            self._totals.replace(old_sum, self._sums[row])
+            if self._totals.needs_resync:
+                self._totals.reset(self._sums)
+            self.dataChanged.emit(self.index(row, COL_QTY), self.index(row, COL_SUM))
+            return True
+        text = "" if value is None else str(value)
+        if col == COL_NAME:
+            self._names[row] = text
+        elif col == COL_UNIT:
+            self._units[row] = text
+        else:
+            self._notes[row] = text
+        self.dataChanged.emit(index, index)
+        return True
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        if count <= 0 or parent.isValid():
+            return False
+        self.beginInsertRows(parent, row, row + count - 1)
+        zeros = array("d", bytes(8 * count))
+        self._names[row:row] = [""] * count
+        self._units[row:row] = [""] * count
+        self._notes[row:row] = [""] * count
+        self._quantities[row:row] = zeros
+        self._prices[row:row] = zeros
+        self._sums[row:row] = zeros
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if count <= 0 or parent.isValid() or row < 0 or row + count > self.rowCount():
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        self._totals.remove(self._sums[row:row + count])
+        for column in (self._names, self._units, self._notes,
+                       self._quantities, self._prices, self._sums):
+            del column[row:row + count]
+        if self._totals.needs_resync:
+            self._totals.reset(self._sums)
+        self.endRemoveRows()
+        return True
+
+    def set_lines(self, lines):
+        """Заменить все строки одним сбросом модели (lines - набор OrderLine)."""
+        self.beginResetModel()
+        self._names = []
+        self._units = []
+        self._notes = []
+        self._quantities = array("d")
+        self._prices = array("d")
+        for line in lines:
+            self._names.append(line.name)
+            self._units.append(line.unit)
+            self._notes.append(line.note)
+            self._quantities.append(line.quantity)
+            self._prices.append(line.price)
+        self._sums = array("d", map(float.__mul__, self._quantities, self._prices))
+        self._totals.reset(self._sums)
+        self.endResetModel()
+
+    def append_lines(self, lines):
+        """Добавить порцию OrderLine в конец таблицы одной операцией вставки."""
+        if not lines:
+            return
+        first = len(self._names)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self._names.extend(line.name for line in lines)
+        self._units.extend(line.unit for line in lines)
+        self._notes.extend(line.note for line in lines)
+        self._quantities.extend(line.quantity for line in lines)
+        self._prices.extend(line.price for line in lines)
+        new_sums = array("d", map(float.__mul__, self._quantities[first:], self._prices[first:]))
+        self._sums.extend(new_sums)
+        self._totals.add(new_sums)
+        if self._totals.needs_resync:
+            self._totals.reset(self._sums)
+        self.endInsertRows()
+
+    def clear(self):
+        """Удалить все строки."""
+        self.set_lines(())
+
+    def take_state(self):
+        """Забрать все строки в виде TableState, оставив модель пустой (без копирования данных)."""
+        state = TableState(self._names, self._units, self._notes,
+                           self._quantities, self._prices, self._sums, self._totals)
+        self.beginResetModel()
+        self._names = []
+        self._units = []
+        self._notes = []
+        self._quantities = array("d")
+        self._prices = array("d")
+        self._sums = array("d")
+        self._totals = RunningTotal()
+        self.endResetModel()
+        return state
+
+    def restore_state(self, state):
+        """Вернуть строки из TableState."""
+        self.beginResetModel()
+        self._names = state.names
+        self._units = state.units
+        self._notes = state.notes
+        self._quantities = state.quantities
+        self._prices = state.prices
+        self._sums = state.sums
+        self._totals = state.totals
+        self.endResetModel()
+
+    def cell_text(self, row, col):
+        """Текстовое значение ячейки, как оно показывается в таблице."""
+        if col == COL_NAME:
+            return self._names[row]
+        if col == COL_UNIT:
+            return self._units[row]
+        if col == COL_QTY:
+            return format_number(self._quantities[row])
+        if col == COL_PRICE:
+            return format_number(self._prices[row])
+        if col == COL_SUM:
+            return f"{self._sums[row]:.2f}"
+        return self._notes[row]
+
+    def journal_line(self, row):
+        """Строка row в формате журнала автосохранения."""
+        return line_values(self._names[row], self._units[row], self._quantities[row],
+                           self._prices[row], self._notes[row])
+
+    def journal_columns(self):
+        """Копия всех строк в формате журнала автосохранения (по столбцам)."""
+        return {
+            "names": list(self._names),
+            "units": list(self._units),
+            "quantities": self._quantities.tolist(),
+            "prices": self._prices.tolist(),
+            "notes": list(self._notes),
+        }
+
+    def lines(self):
+        """Копия всех строк в виде OrderLine (например, для передачи в фоновый поток)."""
+        return list(map(OrderLine, self._names, self._units, self._quantities, self._prices, self._notes))
+
+    def subtotal(self):
+        """Сумма по всем строкам без комиссии (без обхода строк)."""
+        return self._totals.subtotal
+
+
+class DebugPanel(QDockWidget):
+    """Панель отладки со статистикой операций (F12)."""
+    record_added = pyqtSignal(dict)
+
+    COLUMNS = ["Операция", "Вызовов", "Последняя, мс", "Среднее, мс", "Строк", "Память, КБ"]
+
+    def __init__(self, parent=None):
+        super().__init__("Статистика операций", parent)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.setWidget(self.table)
+        self._rows = {}  # Операция -> строка таблицы
+
+        # Записи могут приходить из фоновых потоков, сигнал доставляет их в главный.
+        # Панель подписана на записи, только пока она видна
+        self.record_added.connect(self.show_record)
+        self._listener = self.record_added.emit
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        instrumentation.add_listener(self._listener)
+        # Операции, выполненные, пока панель была скрыта (в том числе фазы запуска)
+        for stats in list(instrumentation.totals.values()):
+            self.show_record(stats["last"])
+
+    def hideEvent(self, event):
+        instrumentation.remove_listener(self._listener)
+        super().hideEvent(event)
+
+    def show_record(self, record):
+        name = record["operation"]
+        stats = instrumentation.totals.get(name)
+        if stats is None:
+            return
+        row = self._rows.get(name)
+        if row is None:
+            row = self._rows[name] = self.table.rowCount()
+            self.table.insertRow(row)
+        memory = record.get("traced_delta_kb", record.get("rss_delta_kb"))
+        values = [
+            name, stats["count"], f"{record['duration_ms']:.2f}",
+            f"{stats['total_ms'] / stats['count']:.2f}",
+            "" if record["rows"] is None else record["rows"],
+            "" if memory is None else memory,
+        ]
+        for col, value in enumerate(values):
+            self.table.setItem(row, col, QTableWidgetItem(str(value)))
+
+
 class OrderApp(QMainWindow):
-    def __init__(self):
+    # Состояние очереди отправки из потока доставки: заказов в очереди, текст ошибки
+    submission_status = pyqtSignal(int, str)
+
+    def __init__(self, startup=None, settings=None):
+        """startup - StartupTimer для замера фаз запуска (по умолчанию создаётся свой),
+        settings - QSettings с прайс-листами и адресом отправки (по умолчанию - настройки пользователя).
+        """
         super().__init__()
+        self.startup = startup or instrumentation.startup_timer()
         self.setWindowTitle("Форма заказа")
         self.setGeometry(100, 100, 1200, 800)
 
-        # Создаем папку для хранения изображений
-        if not os.path.exists(IMAGES_FOLDER):
-            os.makedirs(IMAGES_FOLDER)
+        with self.startup.phase("services"):
+            # Фоновые задачи Excel (ссылки хранятся до завершения задачи)
+            self.thread_pool = QThreadPool.globalInstance()
+            self.active_jobs = set()
+
+            # Хранилище изображений создаётся вместе с блоком изображений
+            self.image_store = None
+
+            # Подсказки по фирмам и продуктам
+            self.completion_index = CompletionIndex.load(COMPLETION_INDEX_PATH, ORDERS_DB_PATH)
+
+            # Каталоги цен поставщиков (открываются в фоне, см. open_price_catalogs)
+            self.settings = settings or QSettings("pl_hesablama", "OrderApp")
+            self.price_catalogs = {}  # Путь к прайс-листу -> PriceCatalog
 
-        # Главное виджет и макет
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.main_layout = QVBoxLayout()
-        self.central_widget.setLayout(self.main_layout)
+        with self.startup.phase("widgets"):
+            # Главное виджет и макет
+            self.central_widget = QWidget()
+            self.setCentralWidget(self.central_widget)
+            self.main_layout = QVBoxLayout()
+            self.central_widget.setLayout(self.main_layout)
 
-        # Поля ввода информации
-        self.create_order_info_section()
+            # Вкладки открытых заказов
+            self.create_order_tabs()
 
-        # Таблица продуктов
-        self.create_product_table()
+            # Поля ввода информации
+            self.create_order_info_section()
+
+            # Таблица продуктов
+            self.create_product_table()
+
+            # Блок изображений (строится при первом открытии)
+            self.create_image_section()
+
+            # Блок управления и итогов
+            self.create_summary_and_controls()
+
+            # Блок управления Excel и AutoCAD
+            self.create_excel_and_cad_controls()
+
+        with self.startup.phase("catalogs"):
+            self.open_price_catalogs(self.price_list_paths())
+
+        # Отправка заказов запускается при первой отправке или сразу, если
+        # в очереди на диске остались заказы прошлого сеанса
+        self.submission = None
+        self.submission_status.connect(self.show_submission_status)
+        if os.path.exists(OUTBOX_PATH):
+            with self.startup.phase("submission"):
+                self.start_submission()
+
+        # Журналы автосохранения заказов
+        self.connect_autosave()
+
+        with self.startup.phase("first_order"):
+            self.new_order()
+            # Пустой заказ запуска закрывается, когда откроется восстановленный
+            self.startup_order_id = self.active_order_id
+
+        # Заказы, оставшиеся в журналах после прошлого сеанса, читаются в фоне
+        with self.startup.phase("recovery"):
+            self.recover_orders(journal_paths(AUTOSAVE_FOLDER))
+        QShortcut(QKeySequence("Ctrl+Shift+Z"), self, activated=self.restore_cleared_order)
+
+        # Панель отладки со статистикой операций создаётся при первом нажатии F12
+        self.debug_panel = None
+        QShortcut(QKeySequence("F12"), self, activated=self.toggle_debug_panel)
+
+    def toggle_debug_panel(self):
+        """Показать или скрыть панель отладки."""
+        if self.debug_panel is None:
+            self.debug_panel = DebugPanel(self)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.debug_panel)
+            return
+        self.debug_panel.setVisible(not self.debug_panel.isVisible())
+
+    def create_order_tabs(self):
+        """Создание вкладок заказов.
+
+        Виджеты формы существуют в одном экземпляре и показывают активный
+        заказ; остальные заказы хранятся в виде OrderSnapshot.
+        """
+        self.order_counter = 0
+        self.active_order_id = None
+        self.snapshots = {}  # id заказа -> OrderSnapshot неактивной вкладки
+        self.journals = {}  # id заказа -> OrderJournal
+        self.recording = True  # False, пока форма заполняется из снимка
+
+        tabs_layout = QHBoxLayout()
+        self.order_tabs = QTabBar()
+        self.order_tabs.setTabsClosable(True)
+        self.order_tabs.setExpanding(False)
+        self.order_tabs.currentChanged.connect(self.switch_order)
+        self.order_tabs.tabCloseRequested.connect(self.close_order)
+        tabs_layout.addWidget(self.order_tabs)
+
+        new_order_btn = QPushButton("Новый заказ")
+        new_order_btn.clicked.connect(self.new_order)
+        tabs_layout.addWidget(new_order_btn)
+        tabs_layout.addStretch()
+
+        self.main_layout.addLayout(tabs_layout)
+
+    def new_order(self):
+        """Открыть пустой заказ в новой вкладке."""
+        self.open_order(OrderSnapshot(), OrderJournal(new_journal_path(AUTOSAVE_FOLDER)))
+
+    def open_order(self, snapshot, journal, title=None):
+        """Открыть заказ из OrderSnapshot в новой вкладке и сделать её активной."""
+        self.order_counter += 1
+        order_id = self.order_counter
+        self.snapshots[order_id] = snapshot
+        self.journals[order_id] = journal
+
+        self.order_tabs.blockSignals(True)
+        index = self.order_tabs.addTab(title or f"Заказ {order_id}")
+        self.order_tabs.setTabData(index, order_id)
+        self.order_tabs.blockSignals(False)
+
+        if self.order_tabs.currentIndex() == index:
+            self.switch_order(index)
+        else:
+            self.order_tabs.setCurrentIndex(index)
+
+    def tab_index(self, order_id):
+        for index in range(self.order_tabs.count()):
+            if self.order_tabs.tabData(index) == order_id:
+                return index
+        return -1
+
+    def switch_order(self, index):
+        """Сохранить активный заказ в снимок и показать заказ вкладки index."""
+        if index < 0:
+            return
+        order_id = self.order_tabs.tabData(index)
+        if order_id == self.active_order_id:
+            return
+        self.recording = False  # Перенос между формой и снимком - не изменение заказа
+        try:
+            if self.active_order_id is not None:
+                self.snapshots[self.active_order_id] = self.take_snapshot()
+            self.active_order_id = order_id
+            self.restore_snapshot(self.snapshots.pop(order_id))
+        finally:
+            self.recording = True
+
+    def close_order(self, index):
+        """Закрыть вкладку заказа."""
+        order_id = self.order_tabs.tabData(index)
+        for job in list(self.active_jobs):
+            if getattr(job, "order_id", None) == order_id:
+                job.cancel()
+        if order_id == self.active_order_id:
+            self.active_order_id = None  # Данные закрываемого заказа не сохраняются
+            images = self.take_images()
+        else:
+            images = self.snapshots.pop(order_id).images
+        self.journals.pop(order_id).discard()
+        self.release_images(images)
+        self.order_tabs.removeTab(index)
+        if self.order_tabs.count() == 0:
+            self.new_order()
+        elif self.active_order_id is None:
+            self.switch_order(self.order_tabs.currentIndex())
+
+    def take_snapshot(self):
+        """Перенести данные формы в OrderSnapshot и освободить виджеты."""
+        return OrderSnapshot(
+            order=self.current_order_info(),
+            table_state=self.table_model.take_state(),
+            commission=self.commission_input.value(),
+            images=self.take_images()
+        )
+
+    def restore_snapshot(self, snapshot):
+        """Показать в форме заказ из OrderSnapshot."""
+        order = snapshot.order
+        # show_order_info не трогает пустой номер и нераспознанные даты, их значения задаются здесь
+        self.serial_number_input.setText(order.serial)
+        self.start_date.setDate(QDate.currentDate())
+        self.end_date.setDate(QDate.currentDate())
+        self.show_order_info(order)
+        if snapshot.table_state is not None:
+            self.table_model.restore_state(snapshot.table_state)
+        else:
+            self.table_model.clear()
+        self.table_model.append_lines(snapshot.pending_lines)
+        self.commission_input.setValue(snapshot.commission)
+        self.set_images(snapshot.images)
+
+    def connect_autosave(self):
+        """Записывать изменения полей, таблицы и комиссии в журнал активного заказа."""
+        for field, widget in (("serial", self.serial_number_input), ("responsible", self.responsible_input),
+                              ("phone", self.phone_input), ("address", self.address_input)):
+            widget.textChanged.connect(lambda text, field=field: self.record_info(field, text))
+        self.company_input.currentTextChanged.connect(lambda text: self.record_info("company", text))
+        for field, widget in (("start_date", self.start_date), ("end_date", self.end_date)):
+            widget.dateChanged.connect(lambda date, field=field: self.record_info(field, date.toString(DATE_FORMAT)))
+        self.commission_input.valueChanged.connect(
+            lambda value: self.record_change({"op": "commission", "value": value})
+        )
+
+        model = self.table_model
+        model.dataChanged.connect(self.record_table_edit)
+        model.rowsInserted.connect(lambda _parent, first, last: self.record_change(
+            {"op": "rows", "row": first, "lines": [model.journal_line(row) for row in range(first, last + 1)]}
+        ))
+        model.rowsRemoved.connect(lambda _parent, first, last: self.record_change(
+            {"op": "remove", "row": first, "count": last - first + 1}
+        ))
+        model.modelReset.connect(lambda: self.record_change({"op": "table", "columns": model.journal_columns()}))
+
+    def record_change(self, record, order_id=None):
+        """Передать изменение в журнал заказа order_id (по умолчанию - активного)."""
+        if not self.recording:
+            return
+        journal = self.journals.get(self.active_order_id if order_id is None else order_id)
+        if journal is not None:
+            journal.append(record)
+
+    def record_info(self, field, value, order_id=None):
+        self.record_change({"op": "info", "field": field, "value": value}, order_id)
+
+    def record_table_edit(self, top_left, bottom_right):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.record_change({"op": "set", "row": row, "line": self.table_model.journal_line(row)})
+
+    def recover_orders(self, paths):
+        """Прочитать журналы в фоне и открыть их заказы во вкладках.
+
+        Журналы, открытые другой запущенной копией программы, пропускаются.
+        """
+        for path in paths:
+            lock = claim_journal(path)
+            if lock is None:
+                continue
+            job = ReplayJournalJob(path)
+            job.signals.result.connect(
+                lambda state, path=path, lock=lock: self.open_recovered_order(path, state, lock)
+            )
+            job.signals.failed.connect(lambda _error, lock=lock: lock.release())
+            self.start_job(job, "Восстановление заказа")
+
+    def open_recovered_order(self, path, state, lock):
+        """Открыть заказ, восстановленный из журнала (JournalState; lock - взятая JournalLock)."""
+        journal = OrderJournal(path, state, lock)
+        if state.is_empty():
+            journal.discard()
+            return
+        snapshot = OrderSnapshot(
+            order=Order(**state.info),
+            table_state=TableState.from_columns(state.names, state.units, state.notes,
+                                                state.quantities, state.prices),
+            commission=DEFAULT_COMMISSION if state.commission is None else state.commission,
+            images=[tuple(item) for item in state.images]
+        )
+        title = state.info["company"] or state.info["serial"] or "Восстановленный заказ"
+        self.open_order(snapshot, journal, title)
+
+        # Пустая вкладка, открытая при запуске, больше не нужна, если в ней ничего не вводили
+        blank_index = self.tab_index(self.startup_order_id)
+        if blank_index >= 0 and self.journals[self.startup_order_id].is_blank():
+            self.close_order(blank_index)
+        self.startup_order_id = None
+
+    def restore_cleared_order(self):
+        """Открыть последний очищенный заказ в новой вкладке (Ctrl+Shift+Z)."""
+        paths = journal_paths(CLEARED_FOLDER)
+        if not paths:
+            print("Нет очищенных заказов для восстановления")
+            return
+        path = os.path.join(AUTOSAVE_FOLDER, os.path.basename(paths[-1]))
+        try:
+            os.replace(paths[-1], path)
+        except OSError as e:  # Заказ уже восстановлен другой копией программы
+            print(f"Не удалось восстановить очищенный заказ: {e}")
+            return
+        self.recover_orders([path])
 
-        # Блок изображений
-        self.create_image_section()
+    def deliver_order_info(self, order_id, order, job=None):
+        """Поля шапки, прочитанные в фоне задачей job, для заказа order_id (активного или нет).
 
-        # Блок управления и итогов
-        self.create_summary_and_controls()
+        Сигналы отменённой задачи могут прийти уже после отмены (они стоят
+        в очереди событий) и пропускаются.
+        """
+        if job is not None and job.is_cancelled():
+            return
+        self.completion_index.add_company(order.company)
+        if order_id == self.active_order_id:
+            self.show_order_info(order)
+        elif order_id in self.snapshots:
+            target = self.snapshots[order_id].order
+            for field in INFO_FIELDS:
+                value = getattr(order, field)
+                if value or field != "serial":
+                    setattr(target, field, value)
+                    self.record_info(field, value, order_id)
+        else:
+            return
+        index = self.tab_index(order_id)
+        if index >= 0 and (order.company or order.serial):
+            self.order_tabs.setTabText(index, order.company or order.serial)
 
-        # Блок управления Excel и AutoCAD
-        self.create_excel_and_cad_controls()
+    def deliver_lines(self, order_id, lines, job=None):
+        """Строки, прочитанные в фоне задачей job, для заказа order_id (активного или нет)."""
+        if job is not None and job.is_cancelled():
+            return
+        self.completion_index.add_products(line.name for line in lines)
+        if order_id == self.active_order_id:
+            self.table_model.append_lines(lines)
+        elif order_id in self.snapshots:
+            self.snapshots[order_id].pending_lines.extend(lines)
+            self.record_change({"op": "rows", "row": None, "lines": [
+                line_values(line.name, line.unit, line.quantity, line.price, line.note) for line in lines
+            ]}, order_id)
 
     def create_order_info_section(self):
         """Создание секции с основной информацией."""
@@ -76,6 +723,9 @@ class OrderApp(QMainWindow):
         # Поля ввода
         grid.addWidget(QLabel("Фирма:"), 1, 0)
         self.company_input = QComboBox()
+        self.company_input.setEditable(True)
+        self.company_input.setInsertPolicy(QComboBox.NoInsert)
+        attach_completer(self.company_input.lineEdit(), self.completion_index.companies)
         grid.addWidget(self.company_input, 1, 1)
 
         grid.addWidget(QLabel("Ответственное лицо:"), 1, 2)
@@ -109,23 +759,25 @@ class OrderApp(QMainWindow):
         # Создаем основной горизонтальный макет для таблицы и кнопок
         table_layout = QHBoxLayout()
 
-        # Таблица продуктов
-        self.table = QTableWidget(0, 6)  # Столбцы: Название, Ед. изм., Кол-во, Цена, Сумма, Примечание
-        self.table.setHorizontalHeaderLabels([
-            "Название продукта", "Ед. изм.", "Кол-во", "Цена", "Сумма", "Примечание"
-        ])
+        # Таблица продуктов: данные хранятся в модели, представление только отображает их
+        self.table_model = OrderTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.horizontalHeader().setStretchLastSection(True)
         table_layout.addWidget(self.table)
 
         # Устанавливаем делегат для числовых столбцов
         numeric_delegate = NumericDelegate(self)
-        self.table.setItemDelegateForColumn(2, numeric_delegate)  # "Кол-во"
-        self.table.setItemDelegateForColumn(3, numeric_delegate)  # "Цена"
-        self.table.setItemDelegateForColumn(4, NumericDelegate(self))
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 4) or QTableWidgetItem("0.00")
-            item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Запрет редактирования
-            self.table.setItem(row, 4, item)
+        self.table.setItemDelegateForColumn(COL_QTY, numeric_delegate)  # "Кол-во"
+        self.table.setItemDelegateForColumn(COL_PRICE, numeric_delegate)  # "Цена"
+        self.table.setItemDelegateForColumn(COL_NAME, CompleterDelegate(self.completion_index.products, self))
+
+        # Пересчёт итога при любом изменении строк
+        self.table_model.dataChanged.connect(self.update_total)
+        self.table_model.dataChanged.connect(self.fill_from_catalog)
+        self.table_model.rowsInserted.connect(self.update_total)
+        self.table_model.rowsRemoved.connect(self.update_total)
+        self.table_model.modelReset.connect(self.update_total)
         # Боковая панель для кнопок
         button_layout = QVBoxLayout()
 
@@ -154,24 +806,116 @@ class OrderApp(QMainWindow):
 
 
     def create_image_section(self):
+        """Создание свёрнутой секции изображений.
+
+        Виджеты, хранилище и миниатюры создаются при первом раскрытии
+        (build_image_section); до этого изображения активного заказа
+        хранятся списком в hidden_images.
+        """
+        self.image_model = None
+        self.hidden_images = []  # [(путь, хеш)] активного заказа, пока секция не построена
+
+        self.image_toggle = QPushButton()
+        self.image_toggle.setCheckable(True)
+        self.image_toggle.toggled.connect(self.toggle_image_section)
+        self.main_layout.addWidget(self.image_toggle, alignment=Qt.AlignLeft)
+
+        self.image_section = QWidget()
+        self.image_section.setVisible(False)
+        self.main_layout.addWidget(self.image_section)
+        self.update_image_toggle()
+
+    def toggle_image_section(self, shown):
+        if shown and self.image_model is None:
+            self.build_image_section()
+        self.image_section.setVisible(shown)
+        self.update_image_toggle()
+
+    def update_image_toggle(self):
+        count = len(self.hidden_images) if self.image_model is None else self.image_model.rowCount()
+        arrow = "▾" if self.image_toggle.isChecked() else "▸"
+        self.image_toggle.setText(f"{arrow} Изображения ({count})")
+
+    def take_images(self):
+        """Забрать изображения активного заказа [(путь, хеш)], оставив секцию пустой."""
+        if self.image_model is None:
+            items, self.hidden_images = self.hidden_images, []
+        else:
+            items = self.image_model.take_items()
+        self.update_image_toggle()
+        return items
+
+    def set_images(self, items):
+        """Показать изображения активного заказа [(путь, хеш)]."""
+        if self.image_model is None:
+            self.hidden_images = list(items)
+        else:
+            self.image_model.set_items(items)
+        self.update_image_toggle()
+
+    def open_image_store(self):
+        """Хранилище изображений (открывается при первом обращении)."""
+        if self.image_store is None:
+            from image_store import ImageStore
+            self.image_store = ImageStore(IMAGES_FOLDER)
+        return self.image_store
+
+    def release_images(self, items):
+        """Снять ссылки заказа, который больше не откроется, на его изображения [(путь, хеш)]."""
+        if items:
+            self.open_image_store().release_all(path for path, _digest in items)
+
+    def build_image_section(self):
         """Создание секции для загрузки и отображения изображений."""
+        from thumbnails import THUMBNAIL_SIZE, ThumbnailListModel
+
+        self.open_image_store()
+
         self.image_layout = QVBoxLayout()
+        self.image_layout.setContentsMargins(0, 0, 0, 0)
 
         # Кнопка загрузки изображений
         upload_button = QPushButton("Загрузить изображение")
         upload_button.clicked.connect(self.upload_image)
         self.image_layout.addWidget(upload_button)
 
-        # Горизонтальный макет для изображений
-        self.image_display = QScrollArea()
-        self.image_display.setWidgetResizable(True)
-        self.image_display_widget = QWidget()
-        self.image_display_layout = QHBoxLayout()  # Изображения будут располагаться в один ряд
-        self.image_display_widget.setLayout(self.image_display_layout)
-        self.image_display.setWidget(self.image_display_widget)
-
+        # Лента миниатюр в один ряд: виджеты не создаются на каждое изображение,
+        # QListView рисует только видимые элементы
+        self.image_model = ThumbnailListModel(THUMBNAILS_FOLDER, self)
+        self.image_model.set_items(self.hidden_images)
+        self.hidden_images = []
+        self.image_model.rowsInserted.connect(self.update_image_toggle)
+        self.image_model.rowsRemoved.connect(self.update_image_toggle)
+        self.image_display = QListView()
+        self.image_display.setModel(self.image_model)
+        self.image_display.setViewMode(QListView.IconMode)
+        self.image_display.setFlow(QListView.LeftToRight)
+        self.image_display.setWrapping(False)
+        self.image_display.setMovement(QListView.Static)
+        self.image_display.setUniformItemSizes(True)
+        self.image_display.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.image_display.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.image_display.setFixedHeight(THUMBNAIL_SIZE + 60)
         self.image_layout.addWidget(self.image_display)
-        self.main_layout.addLayout(self.image_layout)
+
+        # Кнопка удаления выбранного изображения
+        remove_button = QPushButton("Удалить изображение")
+        remove_button.setStyleSheet("""
+            QPushButton {
+                background-color: #F44336;
+                color: white;
+                border: none;
+                padding: 5px;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #D32F2F;
+            }
+        """)
+        remove_button.clicked.connect(self.remove_image)
+        self.image_layout.addWidget(remove_button, alignment=Qt.AlignLeft)
+
+        self.image_section.setLayout(self.image_layout)
 
 
     def create_summary_and_controls(self):
@@ -186,7 +930,7 @@ class OrderApp(QMainWindow):
         summary_layout.addWidget(QLabel("Комиссия (%):"))
         self.commission_input = QSpinBox()
         self.commission_input.setRange(0, 100)
-        self.commission_input.setValue(15)
+        self.commission_input.setValue(DEFAULT_COMMISSION)
         self.commission_input.valueChanged.connect(self.update_total)
         summary_layout.addWidget(self.commission_input)
 
@@ -195,6 +939,13 @@ class OrderApp(QMainWindow):
         self.send_button.clicked.connect(self.send_order)
         summary_layout.addWidget(self.send_button)
 
+        submission_target_btn = QPushButton("Точка приёма...")
+        submission_target_btn.clicked.connect(self.configure_submission)
+        summary_layout.addWidget(submission_target_btn)
+
+        self.submission_label = QLabel("")
+        summary_layout.addWidget(self.submission_label)
+
         self.clear_button = QPushButton("Очистить форму")
         self.clear_button.clicked.connect(self.clear_form)
         summary_layout.addLayout(summary_layout)
@@ -215,38 +966,140 @@ class OrderApp(QMainWindow):
         save_excel_btn.clicked.connect(self.save_to_excel)
         layout.addWidget(save_excel_btn)
 
+        # Кнопка подключения прайс-листа поставщика
+        price_list_btn = QPushButton("Загрузить прайс-лист")
+        price_list_btn.clicked.connect(self.add_price_list)
+        layout.addWidget(price_list_btn)
+
         # Кнопка открытия файла AutoCAD
         open_cad_btn = QPushButton("Открыть AutoCAD файл")
         open_cad_btn.clicked.connect(self.open_cad_file)
         layout.addWidget(open_cad_btn)
 
+        # Ход выполнения фоновой загрузки/сохранения
+        self.job_progress = QProgressBar()
+        self.job_progress.setVisible(False)
+        layout.addWidget(self.job_progress)
+
+        self.cancel_job_btn = QPushButton("Отмена")
+        self.cancel_job_btn.setVisible(False)
+        self.cancel_job_btn.clicked.connect(self.cancel_jobs)
+        layout.addWidget(self.cancel_job_btn)
+
         self.main_layout.addLayout(layout)
 
+    def start_job(self, job, description, span=None):
+        """Запустить фоновую задачу Excel и показать индикатор хода.
+
+        span - замер операции (instrumentation), завершается вместе с задачей.
+        """
+        self.active_jobs.add(job)
+        job.signals.progress.connect(self.on_job_progress)
+        job.signals.finished.connect(lambda completed: self.on_job_done(job, description, completed, span))
+        job.signals.failed.connect(lambda error: self.on_job_failed(job, description, error, span))
+        self.job_progress.setRange(0, 0)  # Неопределённый ход до первого сообщения
+        self.job_progress.setVisible(True)
+        self.cancel_job_btn.setVisible(True)
+        self.thread_pool.start(job)
+
+    def on_job_progress(self, done, total):
+        if total <= 0:
+            self.job_progress.setRange(0, 0)  # Всего неизвестно: индикатор занятости
+            return
+        self.job_progress.setRange(0, total)
+        self.job_progress.setValue(done)
+
+    def on_job_done(self, job, description, completed, span=None):
+        self.finish_job(job)
+        if span is not None:
+            span.finish(rows=job.rows_done, error=None if completed else "отменено")
+        self.completion_index.save()
+        print(f"{description}: {'готово' if completed else 'отменено'}.")
+
+    def on_job_failed(self, job, description, error, span=None):
+        self.finish_job(job)
+        if span is not None:
+            span.finish(rows=job.rows_done, error=error)
+        print(f"Ошибка ({description}): {error}")
+
+    def finish_job(self, job):
+        self.active_jobs.discard(job)
+        if not self.active_jobs:
+            self.job_progress.setVisible(False)
+            self.cancel_job_btn.setVisible(False)
+
+    def cancel_jobs(self):
+        """Отменить все выполняющиеся задачи Excel."""
+        for job in list(self.active_jobs):
+            job.cancel()
+
+    def closeEvent(self, event):
+        self.cancel_jobs()
+        self.thread_pool.waitForDone()
+        for journal in self.journals.values():
+            journal.close()  # Журналы остаются на диске и открываются при следующем запуске
+        if self.submission is not None:
+            self.submission.stop()  # Неотправленные заказы остаются в очереди на диске
+        super().closeEvent(event)
+
     def load_excel_data(self):
         """Загрузка данных из Excel в форму."""
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите Excel файл", "", "Excel Files (*.xlsx)")
         if not file_path:
             return
 
-        try:
-            workbook = openpyxl.load_workbook(file_path)
-            sheet = workbook.active
-
-            self.company_input.setCurrentText(sheet["A1"].value or "")
-            self.responsible_input.setText(sheet["A2"].value or "")
-            self.phone_input.setText(sheet["A3"].value or "")
-
-            self.table.setRowCount(0)
-            for row in sheet.iter_rows(min_row=2, max_col=6, values_only=True):
-                current_row = self.table.rowCount()
-                self.table.insertRow(current_row)
-                for col, value in enumerate(row):
-                    self.table.setItem(current_row, col, QTableWidgetItem(str(value)))
-
-        except Exception as e:
-            print(f"Ошибка при загрузке Excel: {e}")
-
-    from openpyxl.styles import Alignment, Font, Border, Side
+        # Предыдущая загрузка в тот же заказ больше не нужна
+        order_id = self.active_order_id
+        for job in self.active_jobs:
+            if isinstance(job, LoadExcelJob) and job.order_id == order_id:
+                job.cancel()
+
+        # Файл читается в фоновом потоке, строки добавляются в заказ порциями,
+        # даже если пользователь тем временем перешёл на другую вкладку
+        span = instrumentation.start("load_excel_data")
+        self.table_model.clear()
+        job = LoadExcelJob(file_path)
+        job.order_id = order_id
+        job.signals.info.connect(lambda order: self.deliver_order_info(order_id, order, job))
+        job.signals.rows.connect(lambda lines: self.deliver_lines(order_id, lines, job))
+        self.start_job(job, "Загрузка Excel", span)
+
+    def show_order_info(self, order):
+        """Заполнить поля шапки из заказа (Order)."""
+        if order.serial:
+            self.serial_number_input.setText(order.serial)
+        self.company_input.setCurrentText(order.company)
+        self.responsible_input.setText(order.responsible)
+        self.phone_input.setText(order.phone)
+        self.address_input.setText(order.address)
+        # Даты заказа записываются в DATE_FORMAT; ГГГГ-ММ-ДД и формат поля остаются
+        # для дат из ячеек Excel и журналов прежних версий
+        for date_edit, value in ((self.start_date, order.start_date), (self.end_date, order.end_date)):
+            date = QDate.fromString(value[:10], DATE_FORMAT)
+            if not date.isValid():
+                date = QDate.fromString(value[:10], Qt.ISODate)
+            if not date.isValid():
+                date = QDate.fromString(value, date_edit.displayFormat())
+            if date.isValid():
+                date_edit.setDate(date)
+
+    def current_order_info(self):
+        """Поля шапки формы в виде Order без строк."""
+        return Order(
+            serial=self.serial_number_input.text(),
+            company=self.company_input.currentText(),
+            responsible=self.responsible_input.text(),
+            phone=self.phone_input.text(),
+            start_date=self.start_date.date().toString(DATE_FORMAT),
+            end_date=self.end_date.date().toString(DATE_FORMAT),
+            address=self.address_input.text()
+        )
+
+    def current_order(self):
+        """Снимок формы в виде Order со строками из таблицы."""
+        order = self.current_order_info()
+        order.lines = self.table_model.lines()
+        return order
 
     def save_to_excel(self):
         """Сохранение данных формы в Excel с форматированием."""
@@ -254,82 +1107,63 @@ class OrderApp(QMainWindow):
         if not file_path:
             return
 
-        try:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-
-            # Установка названий колонок
-            headers = [
-                "Serial", "Фирма", "Ответственное лицо", "Телефон", "Дата начала",
-                "Дата окончания", "Адрес", "Название продукта", "Ед. изм.", "Кол-во",
-                "Цена", "Сумма", "Примечание"
-            ]
-
-
-            for col_num, header in enumerate(headers, start=1):
-                cell = sheet.cell(row=1, column=col_num, value=header)
-                # Форматирование заголовков
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = openpyxl.styles.PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-
-            # Запись основной информации
-            serial = self.serial_number_input.text() or "1111"  # Значение по умолчанию
-            sheet.cell(row=2, column=1, value=serial)
-            sheet.cell(row=2, column=2, value=self.company_input.currentText())
-            sheet.cell(row=2, column=3, value=self.responsible_input.text())
-            sheet.cell(row=2, column=4, value=self.phone_input.text())
-            sheet.cell(row=2, column=5, value=self.start_date.text())
-            sheet.cell(row=2, column=6, value=self.end_date.text())
-            sheet.cell(row=2, column=7, value=self.address_input.text())
-
-            # Добавление формата для ячеек основной информации
-            for row in range(2, 3):  # Строка основной информации
-                for col in range(1, 8):  # Колонки от 1 до 7
-                    cell = sheet.cell(row=row, column=col)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    cell.border = Border(
-                        left=Side(style="thin"), right=Side(style="thin"),
-                        top=Side(style="thin"), bottom=Side(style="thin")
-                    )
-
-            # Проверка на дублирование серийного номера
-            serial_duplicate_count = 1
-            for row in range(self.table.rowCount()):
-                current_serial = serial
-                if row > 0:  # Добавляем суффикс для последующих строк
-                    current_serial += f"-{serial_duplicate_count}"
-                    serial_duplicate_count += 1
-
-                base_row = row + 3  # Начиная с третьей строки
-                sheet.cell(row=base_row, column=1, value=serial)  # Serial
-                sheet.cell(row=base_row, column=2, value=self.company_input.currentText())  # Фирма
-                sheet.cell(row=base_row, column=3, value=self.responsible_input.text())  # Ответственное лицо
-                sheet.cell(row=base_row, column=4, value=self.phone_input.text())  # Телефон
-                sheet.cell(row=base_row, column=5, value=self.start_date.text())  # Дата начала
-                sheet.cell(row=base_row, column=6, value=self.end_date.text())  # Дата окончания
-                sheet.cell(row=base_row, column=7, value=self.address_input.text())  # Адрес
-                for col_idx in range(self.table.columnCount()):
-                    item = self.table.item(row, col_idx)
-                    value = item.text() if item else ""
-                    sheet.cell(row=base_row, column=col_idx + 8, value=value)  # Продуктовые данные
-
-                # Форматирование строк данных
-                for col in range(1, 8):
-                    cell = sheet.cell(row=base_row, column=col)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                    cell.border = Border(
-                        left=Side(style="thin"), right=Side(style="thin"),
-                        top=Side(style="thin"), bottom=Side(style="thin")
-                    )
-
-            workbook.save(file_path)
-            print("Данные успешно сохранены.")
-
-        except Exception as e:
-            print(f"Ошибка сохранения в Excel: {e}")
-
-
+        # Снимок данных делается в главном потоке, запись файла - в фоновом
+        span = instrumentation.start("save_to_excel")
+        order = self.current_order()
+        self.completion_index.add_order(order)
+        job = SaveExcelJob(file_path, order, ORDERS_DB_PATH)
+        self.start_job(job, "Сохранение в Excel", span)
+
+    def price_list_paths(self):
+        """Подключённые прайс-листы из настроек."""
+        paths = self.settings.value("price_lists", [])
+        return [paths] if isinstance(paths, str) else list(paths or [])
+
+    def add_price_list(self):
+        """Подключить прайс-лист поставщика для автозаполнения цен."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Выберите прайс-лист", "", "Excel Files (*.xlsx)")
+        if not file_path:
+            return
+        paths = self.price_list_paths()
+        if file_path not in paths:
+            paths.append(file_path)
+            self.settings.setValue("price_lists", paths)
+        self.open_price_catalogs([file_path])
+
+    def open_price_catalogs(self, paths):
+        """Открыть каталоги цен в фоне."""
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            if any(isinstance(job, OpenCatalogJob) and job.file_path == path for job in self.active_jobs):
+                continue  # Каталог уже открывается
+            # Прежний каталог закрывается до перестроения: файл его кэша не должен оставаться открытым
+            previous = self.price_catalogs.pop(path, None)
+            if previous is not None:
+                previous.close()
+            job = OpenCatalogJob(path)
+            job.signals.result.connect(lambda catalog, path=path: self.set_price_catalog(path, catalog))
+            self.start_job(job, "Прайс-лист")
+
+    def set_price_catalog(self, path, catalog):
+        previous = self.price_catalogs.pop(path, None)
+        if previous is not None:
+            previous.close()
+        self.price_catalogs[path] = catalog
+
+    def fill_from_catalog(self, top_left, bottom_right):
+        """Заполнить ед. изм. и цену по каталогу после ввода названия продукта."""
+        if top_left.column() != COL_NAME or top_left.row() != bottom_right.row():
+            return
+        row = top_left.row()
+        name = self.table_model.cell_text(row, COL_NAME)
+        for catalog in self.price_catalogs.values():
+            found = catalog.lookup(name)
+            if found is not None:
+                unit, price = found
+                self.table_model.setData(self.table_model.index(row, COL_UNIT), unit)
+                self.table_model.setData(self.table_model.index(row, COL_PRICE), price)
+                return
 
     def open_cad_file(self):
         """Открытие файла AutoCAD."""
@@ -337,6 +1171,8 @@ class OrderApp(QMainWindow):
         if not file_path:
             return
 
+        import subprocess
+
         try:
             subprocess.Popen(file_path, shell=True)
         except Exception as e:
@@ -344,14 +1180,14 @@ class OrderApp(QMainWindow):
 
     def add_row(self):
         """Добавить строку в таблицу."""
-        row_position = self.table.rowCount()
-        self.table.insertRow(row_position)
+        row_position = self.table_model.rowCount()
+        self.table_model.insertRows(row_position, 1)
 
     def delete_row(self):
         """Удалить выбранную строку из таблицы."""
-        current_row = self.table.currentRow()
+        current_row = self.table.currentIndex().row()
         if current_row >= 0:
-            self.table.removeRow(current_row)
+            self.table_model.removeRows(current_row, 1)
 
 
     def upload_image(self):
@@ -359,108 +1195,174 @@ class OrderApp(QMainWindow):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите изображение", "", "Images (*.png *.jpg *.jpeg)", options=options)
         if file_path:
-            file_name = os.path.basename(file_path)
-            save_path = os.path.join(IMAGES_FOLDER, file_name)
-            QPixmap(file_path).save(save_path)
-
-            # Создаем контейнер для изображения и кнопки
-            container = QFrame()
-            container.setStyleSheet("border: 1px solid #ccc; border-radius: 5px; margin: 5px;")
-            container_layout = QVBoxLayout()
-            container.setLayout(container_layout)
-
-            # Добавляем изображение
-            pixmap = QPixmap(save_path)
-            label = QLabel()
-            label.setPixmap(pixmap.scaled(150, 150, Qt.KeepAspectRatio))
-            label.setAlignment(Qt.AlignCenter)
-            container_layout.addWidget(label)
-
-            # Добавляем кнопку удаления
-            remove_button = QPushButton("Удалить")
-            remove_button.setStyleSheet("""
-                QPushButton {
-                    background-color: #F44336;
-                    color: white;
-                    border: none;
-                    padding: 5px;
-                    border-radius: 5px;
-                }
-                QPushButton:hover {
-                    background-color: #D32F2F;
-                }
-            """)
-            remove_button.clicked.connect(lambda: self.remove_image(container, save_path))
-            container_layout.addWidget(remove_button, alignment=Qt.AlignCenter)
-
-            # Добавляем контейнер в горизонтальный лэйаут
-            self.image_display_layout.addWidget(container)
-
-    def remove_image(self, container, file_path):
-        """Удаление изображения из виджета и файла."""
-        # Удаляем виджет
-        self.image_display_layout.removeWidget(container)
-        container.deleteLater()
-
-        # Удаляем файл изображения
-        if os.path.exists(file_path):
-            os.remove(file_path)
+            with instrumentation.measure("upload_image") as span:
+                # Файл сохраняется один раз под хешем содержимого, миниатюра строится в фоне
+                save_path = self.image_store.add(file_path)
+                digest = self.image_store.digest_of(save_path)
+                self.image_model.add_image(save_path, digest)
+                self.record_change({"op": "image_add", "path": save_path, "digest": digest})
+                span.rows = 1
+
+    def remove_image(self):
+        """Удаление выбранного изображения из списка и файла."""
+        current_row = self.image_display.currentIndex().row()
+        if current_row < 0:
+            return
+        file_path = self.image_model.remove_image(current_row)
+        self.record_change({"op": "image_remove", "row": current_row})
+
+        # Файл удаляется, только если на него не ссылаются другие заказы
+        self.image_store.release(file_path)
 
     def update_total(self):
         """Обновить итоговую сумму с учетом комиссии."""
-        total = 0
-        for row in range(self.table.rowCount()):
-            try:
-                # Получаем значения количества и цены
-                quantity_item = self.table.item(row, 2)  # Кол-во
-                price_item = self.table.item(row, 3)  # Цена
-                
-                # Проверяем, есть ли значения в ячейках
-                quantity = float(quantity_item.text() if quantity_item and quantity_item.text() else 0)
-                price = float(price_item.text() if price_item and price_item.text() else 0)
-                
-                # Рассчитываем сумму для строки
-                row_sum = quantity * price
-                total += row_sum
-                
-                # Обновляем ячейку "Сумма" (4-й столбец) и делаем её только для чтения
-                item = QTableWidgetItem(f"{row_sum:.2f}")
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # Запрет редактирования
-                self.table.setItem(row, 4, item)
-            except (ValueError, AttributeError):
-                # Игнорируем строки с некорректными данными
-                item = QTableWidgetItem("0.00")
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.table.setItem(row, 4, item)
-
-        # Рассчитываем итоговую сумму с учетом комиссии
-        commission = self.commission_input.value() / 100
-        total_with_commission = total * (1 + commission)
+        started = time.perf_counter()
+        # Модель ведёт нарастающий итог, здесь остаётся только учесть комиссию
+        total = total_with_commission(self.table_model.subtotal(), self.commission_input.value())
 
         # Обновляем итоговый лейбл
-        self.total_label.setText(f"Итог: {total_with_commission:.2f} AZN")
+        self.total_label.setText(f"Итог: {total:.2f} AZN")
+        # Итог пересчитывается при каждой правке, в статистику он попадает сводкой за интервал
+        instrumentation.record_sample("update_total", time.perf_counter() - started, self.table_model.rowCount())
+
 
 
+    def submission_target(self):
+        """Адрес точки приёма (http://...) или путь к базе приёма из настроек; "" - не указан."""
+        return (self.settings.value("submission/target", "") or "").strip()
+
+    def configure_submission(self):
+        """Спросить точку приёма заказов, сохранить её и перезапустить доставку."""
+        from submission import make_transport
+
+        target, accepted = QInputDialog.getText(
+            self, "Точка приёма заказов", "Адрес (http://хост:порт/orders) или файл базы приёма:",
+            text=self.submission_target()
+        )
+        target = target.strip()
+        if not accepted or not target:
+            return False
+        try:
+            make_transport(target)  # Неподдерживаемый адрес не сохраняется
+        except ValueError as e:
+            print(e)
+            self.submission_label.setText(str(e))
+            return False
+        self.settings.setValue("submission/target", target)
+        if self.submission is not None:
+            self.submission.stop()
+            self.submission = None
+        return self.start_submission()
+
+    def start_submission(self):
+        """Запустить фоновую доставку заказов из очереди на диске.
+
+        Возвращает False, если точка приёма не указана или не поддерживается
+        (доставка не запущена).
+        """
+        from submission import SubmissionService, make_transport
+
+        target = self.submission_target()
+        if not target:
+            self.submission_label.setText("Отправка не настроена: укажите точку приёма")
+            return False
+        try:
+            transport = make_transport(target)
+        except ValueError as e:
+            self.submission_label.setText(f"Отправка не настроена: {e}")
+            return False
+        self.submission = SubmissionService(
+            transport, OUTBOX_PATH,
+            listener=lambda pending, error: self.submission_status.emit(pending, error or "")
+        )
+        self.submission.start()
+        return True
 
     def send_order(self):
-        """Обработчик кнопки 'Отправить заказ'."""
-        print("Заказ отправлен!")
+        """Поставить заказ в очередь отправки; доставка идёт в фоне."""
+        order = self.current_order()
+        if not order.lines:
+            print("Заказ пуст, отправлять нечего")
+            return
+        if self.submission is None and not self.start_submission() and not self.configure_submission():
+            return
+        try:
+            delivering = self.submission.submit(order, self.commission_input.value())
+        except Exception as e:
+            print(f"Ошибка постановки заказа в очередь отправки: {e}")
+            self.submission_label.setText(f"Заказ не поставлен в очередь: {e}")
+            return
+        if not delivering:
+            # Поток доставки завершился; новый заберёт заказ из очереди на диске
+            self.start_submission()
+
+    def show_submission_status(self, pending, error):
+        if error:
+            self.submission_label.setText(f"В очереди: {pending}, ошибка: {error} (повтор позже)")
+        elif pending:
+            self.submission_label.setText(f"В очереди: {pending}")
+        else:
+            self.submission_label.setText("Заказы отправлены")
 
     def clear_form(self):
         """Очистить форму."""
-        self.company_input.clear()
-        self.responsible_input.clear()
-        self.phone_input.clear()
-        self.address_input.clear()
-        self.table.setRowCount(0)
-        self.total_label.setText("Итог: 0 AZN")
-        for i in reversed(range(self.image_display_layout.count())):
-            widget = self.image_display_layout.itemAt(i).widget()
-            widget.deleteLater()
+        # Журнал очищаемого заказа переносится в autosave/cleared, Ctrl+Shift+Z открывает его снова.
+        # Изображения заказа остаются в хранилище, пока журнал не вытеснен из cleared
+        for state in self.journals.pop(self.active_order_id).archive():
+            self.release_images(state.images)
+        self.journals[self.active_order_id] = OrderJournal(new_journal_path(AUTOSAVE_FOLDER))
+
+        self.recording = False
+        try:
+            self.company_input.clear()
+            self.company_input.clearEditText()
+            self.responsible_input.clear()
+            self.phone_input.clear()
+            self.address_input.clear()
+            self.table_model.clear()
+            self.total_label.setText("Итог: 0 AZN")
+            self.set_images([])
+        finally:
+            self.recording = True
+        self.record_change({
+            "op": "snapshot",
+            "info": self.current_order_info().info(),
+            "commission": self.commission_input.value(),
+            "columns": self.table_model.journal_columns(),
+            "images": [],
+        })
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = OrderApp()
+    # Пакетный режим без окна: python pl_hesablama.py batch <папка> <папка>
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch import main
+        sys.exit(main(sys.argv[2:]))
+
+    # Статистика операций пишется в logs/, --profile и --trace-memory включают
+    # cProfile и tracemalloc на весь сеанс, --startup-time выводит время фаз запуска
+    instrumentation.configure_log()
+    startup = instrumentation.startup_timer(IMPORT_STARTED)
+    startup.add("imports", time.perf_counter() - IMPORT_STARTED)
+    instrumentation.start_session_profiling(
+        profile="--profile" in sys.argv, trace_memory="--trace-memory" in sys.argv
+    )
+
+    with startup.phase("qapplication"):
+        app = QApplication(sys.argv)
+    window = OrderApp(startup)
     window.show()
-    sys.exit(app.exec_())
+    shown_at = time.perf_counter()
+
+    def startup_finished():
+        # Первый проход цикла событий: окно показано и принимает ввод
+        startup.add("first_show", time.perf_counter() - shown_at)
+        startup.finish()
+        if "--startup-time" in sys.argv:
+            print(startup.report())
+
+    QTimer.singleShot(0, startup_finished)
+    exit_code = app.exec_()
+    instrumentation.flush_samples()
+    instrumentation.stop_session_profiling()
+    sys.exit(exit_code)
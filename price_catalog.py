@@ -0,0 +1,201 @@
+"""Каталог цен поставщика с быстрым поиском по названию продукта.
+
+Прайс-лист (xlsx) читается один раз, по нему строится хеш-таблица в
+компактном двоичном файле. При следующих запусках файл открывается через
+mmap без разбора, а перестраивается только если изменился исходный xlsx
+(по времени изменения и размеру). Время изменения и размер входят в имя
+файла кэша, поэтому перестроенный кэш пишется в новый файл и не заменяет
+старый, который может быть открыт через mmap (в Windows это запрещено).
+
+Формат файла кэша (little-endian):
+    заголовок  HEADER: сигнатура, mtime_ns и размер исходного файла,
+               число записей, размер хеш-таблицы (степень двойки);
+    таблица    table_size x uint32: номер записи + 1 (0 - пустая ячейка),
+               открытая адресация с линейным пробированием по crc32 ключа;
+    записи     count x ENTRY: смещение и длина ключа, смещение и длина
+               единицы измерения в блоке строк, цена;
+    строки     UTF-8 ключей (название в casefold) и единиц измерения.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import chain
+
+from order_core import parse_number
+
+CACHE_FOLDER = "catalog_cache"
+MAGIC = b"PLCAT001"
+HEADER = struct.Struct("<8sqqII")
+SLOT = struct.Struct("<I")
+ENTRY = struct.Struct("<IIIId")
+
+# Заголовки столбцов прайс-листа (в нижнем регистре, по началу текста)
+NAME_HEADERS = ("название", "наименование", "продукт", "товар")
+UNIT_HEADERS = ("ед",)
+PRICE_HEADERS = ("цена",)
+
+
+def catalog_key(name):
+    """Ключ поиска по названию продукта."""
+    return name.strip().casefold()
+
+
+def _find_column(header, prefixes):
+    for position, title in enumerate(header):
+        title = str(title or "").strip().lower()
+        if title.startswith(prefixes):
+            return position
+    return None
+
+
+def read_price_list(source_path):
+    """Построчно читать прайс-лист: (название, ед. изм., цена).
+
+    Столбцы ищутся по заголовкам первой строки; если заголовков нет,
+    используются первые три столбца.
+    """
+    from excel_io import iter_sheet_rows  # openpyxl нужен только при перестроении кэша
+
+    rows = iter_sheet_rows(source_path)
+    header = next(rows, None) or ()
+    columns = (
+        _find_column(header, NAME_HEADERS),
+        _find_column(header, UNIT_HEADERS),
+        _find_column(header, PRICE_HEADERS),
+    )
+    if columns[0] is None or columns[2] is None:
+        columns = (0, 1, 2)
+        rows = chain([header], rows) if header else rows
+    name_col, unit_col, price_col = columns
+    for row in rows:
+        if not row or len(row) <= name_col or row[name_col] in (None, ""):
+            continue
+        unit = row[unit_col] if unit_col is not None and len(row) > unit_col else None
+        price = row[price_col] if len(row) > price_col else None
+        yield str(row[name_col]), "" if unit is None else str(unit), parse_number(price)
+
+
+def build_catalog(source_path, cache_path):
+    """Построить двоичный файл каталога по прайс-листу."""
+    entries = {}
+    for name, unit, price in read_price_list(source_path):
+        key = catalog_key(name)
+        if key:
+            entries[key] = (unit, price)  # При повторах действует последняя строка
+
+    table_size = 8
+    while table_size < len(entries) * 2:
+        table_size *= 2
+    mask = table_size - 1
+    slots = array("I", bytes(4 * table_size))
+    records = bytearray()
+    strings = bytearray()
+    for number, (key, (unit, price)) in enumerate(entries.items()):
+        key_bytes = key.encode("utf-8")
+        unit_bytes = unit.encode("utf-8")
+        records += ENTRY.pack(len(strings), len(key_bytes), len(strings) + len(key_bytes), len(unit_bytes), price)
+        strings += key_bytes + unit_bytes
+        slot = zlib.crc32(key_bytes) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = number + 1
+    if sys.byteorder == "big":
+        slots.byteswap()
+
+    stat = os.stat(source_path)
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, stat.st_mtime_ns, stat.st_size, len(entries), table_size))
+        file.write(slots.tobytes())
+        file.write(records)
+        file.write(strings)
+    os.replace(temp_path, cache_path)
+
+
+def _cache_prefix(source_path):
+    return hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()[:16]
+
+
+def default_cache_path(source_path, stat=None):
+    """Путь к файлу кэша для текущей версии прайс-листа (stat - результат os.stat, если уже есть)."""
+    stat = stat or os.stat(source_path)
+    return os.path.join(CACHE_FOLDER, f"{_cache_prefix(source_path)}-{stat.st_mtime_ns}-{stat.st_size}.bin")
+
+
+def remove_old_caches(source_path, keep_path):
+    """Удалить кэши прежних версий прайс-листа; ещё открытые (в Windows) остаются до следующего раза."""
+    folder = os.path.dirname(keep_path)
+    prefix = _cache_prefix(source_path)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(prefix) and name.endswith(".bin") and path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class PriceCatalog:
+    """Каталог цен, открытый из двоичного файла через mmap."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        with open(cache_path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.source_mtime_ns, self.source_size, self.count, self.table_size = \
+            HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            self._data.close()
+            raise ValueError(f"Неверный формат файла каталога: {cache_path}")
+        self._slots_offset = HEADER.size
+        self._entries_offset = self._slots_offset + SLOT.size * self.table_size
+        self._strings_offset = self._entries_offset + ENTRY.size * self.count
+
+    @classmethod
+    def open(cls, source_path, cache_path=None):
+        """Открыть каталог прайс-листа, перестроив кэш, если xlsx изменился."""
+        stat = os.stat(source_path)
+        versioned = cache_path is None
+        cache_path = cache_path or default_cache_path(source_path, stat)
+        if os.path.exists(cache_path):
+            catalog = cls(cache_path)
+            if (catalog.source_mtime_ns, catalog.source_size) == (stat.st_mtime_ns, stat.st_size):
+                return catalog
+            catalog.close()
+        build_catalog(source_path, cache_path)
+        if versioned:
+            remove_old_caches(source_path, cache_path)
+        return cls(cache_path)
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, offset, length):
+        start = self._strings_offset + offset
+        return self._data[start:start + length]
+
+    def lookup(self, name):
+        """(ед. изм., цена) для продукта или None, если его нет в каталоге."""
+        key_bytes = catalog_key(name).encode("utf-8")
+        if not key_bytes:
+            return None
+        mask = self.table_size - 1
+        slot = zlib.crc32(key_bytes) & mask
+        while True:
+            number = SLOT.unpack_from(self._data, self._slots_offset + SLOT.size * slot)[0]
+            if not number:
+                return None
+            key_offset, key_length, unit_offset, unit_length, price = ENTRY.unpack_from(
+                self._data, self._entries_offset + ENTRY.size * (number - 1)
+            )
+            if self._string(key_offset, key_length) == key_bytes:
+                return self._string(unit_offset, unit_length).decode("utf-8"), price
+            slot = (slot + 1) & mask
+
+    def close(self):
+        self._data.close()
@@ -0,0 +1,556 @@
+"""Отправка заказов в центральную точку приёма.
+
+Заказ сначала записывается в очередь на диске (outbox.db) в вызывающем
+потоке, поэтому он не теряется без сети, при закрытии программы и при
+остановке доставки. Доставкой занимается цикл asyncio в фоновом потоке
+(SubmissionService): он собирает заказы из очереди в порции, отправляет до
+CONCURRENCY порций одновременно и при ошибке откладывает порцию с
+экспоненциально растущей задержкой. Окно никогда не ждёт сеть.
+
+Способ доставки (транспорт) - любой объект с методами async send(orders)
+(ошибка - исключение) и async close():
+    HttpTransport    POST JSON {"orders": [...]} по HTTP/1.1 с повторным
+                     использованием соединений;
+    SqliteTransport  запись в локальную базу приёма (без сети).
+Для проверки без сервера есть локальная точка приёма LocalReceiver:
+    python submission.py serve --port 8765 --db intake.db [--fail-rate 0.2]
+Каждый заказ несёт submission_id, поэтому повторная доставка после
+обрыва связи не создаёт дубликатов в базе приёма.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http import HTTPStatus
+
+from instrumentation import instrumentation
+from order_core import order_serial, order_subtotal, total_with_commission
+
+OUTBOX_PATH = "outbox.db"
+# База приёма локальной точки приёма (LocalReceiver) и SqliteTransport
+INTAKE_DB_PATH = "intake.db"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+INTAKE_PATH = "/orders"
+# Сколько заказов отправлять одним запросом
+BATCH_SIZE = 20
+# Сколько ждать после нового заказа, чтобы в порцию попали следующие, с
+BATCH_WINDOW = 0.05
+# Сколько порций может отправляться одновременно (и открытых соединений HTTP)
+CONCURRENCY = 4
+# Время ожидания соединения и ответа, с
+TIMEOUT = 10.0
+# Задержка повторной отправки: BACKOFF_BASE * 2 ** попытка, но не больше BACKOFF_MAX, с
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+# Сколько ждать остановки фонового потока при закрытии программы, с
+STOP_TIMEOUT = 2.0
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(claimed, next_attempt_at);
+"""
+
+INTAKE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS received_orders (
+    submission_id TEXT PRIMARY KEY,
+    serial TEXT NOT NULL,
+    company TEXT NOT NULL,
+    total REAL NOT NULL,
+    received_at TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+
+class SubmissionError(Exception):
+    """Точка приёма не приняла порцию заказов."""
+
+
+def order_payload(order, commission):
+    """Заказ (Order) в виде словаря для отправки."""
+    payload = order.info()
+    payload["serial"] = order_serial(order.serial)
+    payload["submission_id"] = uuid.uuid4().hex
+    payload["commission"] = commission
+    payload["total"] = total_with_commission(order_subtotal(order.lines), commission)
+    payload["lines"] = [[line.name, line.unit, line.quantity, line.price, line.note] for line in order.lines]
+    return payload
+
+
+def backoff_delay(attempts):
+    """Задержка перед следующей попыткой (со случайным разбросом, чтобы клиенты не били в сервер разом)."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempts) * random.uniform(0.5, 1.0)
+
+
+class Outbox:
+    """Очередь заказов на отправку в SQLite.
+
+    Порция, взятая на отправку, помечается claimed и возвращается в очередь
+    при ошибке. release_claimed - снять все пометки (при запуске доставки,
+    когда отправляемых порций ещё нет).
+    """
+
+    def __init__(self, path=OUTBOX_PATH, release_claimed=False):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(OUTBOX_SCHEMA)
+        if release_claimed:
+            with self.connection:
+                self.connection.execute("UPDATE outbox SET claimed = 0 WHERE claimed = 1")
+
+    def close(self):
+        self.connection.close()
+
+    def put(self, payload):
+        """Поставить заказ (словарь) в очередь и вернуть его id."""
+        now = time.time()
+        with self.connection:
+            return self.connection.execute(
+                "INSERT INTO outbox (payload, queued_at, next_attempt_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now)
+            ).lastrowid
+
+    def claim_due(self, limit):
+        """Взять на отправку до limit заказов, срок которых наступил: [(id, заказ, время постановки, попытки)]."""
+        with self.connection:
+            rows = self.connection.execute(
+                "SELECT id, payload, queued_at, attempts FROM outbox "
+                "WHERE claimed = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+            self.connection.executemany("UPDATE outbox SET claimed = 1 WHERE id = ?", ((row[0],) for row in rows))
+        return [(row_id, json.loads(payload), queued_at, attempts) for row_id, payload, queued_at, attempts in rows]
+
+    def delete(self, ids):
+        """Удалить доставленные заказы."""
+        with self.connection:
+            self.connection.executemany("DELETE FROM outbox WHERE id = ?", ((row_id,) for row_id in ids))
+
+    def release(self, ids, error, delay):
+        """Вернуть заказы в очередь с повторной попыткой через delay секунд."""
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE outbox SET claimed = 0, attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                ((time.time() + delay, error, row_id) for row_id in ids)
+            )
+
+    def pending_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def next_attempt_delay(self):
+        """Через сколько секунд наступит срок следующего отложенного заказа (None, если таких нет)."""
+        next_attempt_at = self.connection.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE claimed = 0"
+        ).fetchone()[0]
+        return None if next_attempt_at is None else max(0.0, next_attempt_at - time.time())
+
+
+class IntakeDatabase:
+    """База приёма заказов; повторно присланные заказы (тот же submission_id) пропускаются."""
+
+    def __init__(self, path=INTAKE_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(INTAKE_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def store(self, orders):
+        """Сохранить порцию заказов и вернуть число новых."""
+        received_at = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO received_orders "
+                "(submission_id, serial, company, total, received_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (order["submission_id"], order["serial"], order["company"], order["total"],
+                     received_at, json.dumps(order, ensure_ascii=False))
+                    for order in orders
+                )
+            )
+            return self.connection.total_changes - before
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM received_orders").fetchone()[0]
+
+
+async def read_headers(reader):
+    """Заголовки HTTP до пустой строки (имена в нижнем регистре)."""
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+class HttpTransport:
+    """Отправка порций POST-запросом JSON; соединения остаются открытыми и используются повторно."""
+
+    def __init__(self, url, timeout=TIMEOUT):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != "http":
+            raise ValueError(f"Поддерживаются только адреса http://: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self._idle = []  # Свободные соединения (reader, writer)
+
+    async def send(self, orders):
+        body = json.dumps({"orders": orders}, ensure_ascii=False).encode("utf-8")
+        reader, writer, reused = await self._connection()
+        try:
+            status, keep_alive = await asyncio.wait_for(self._request(reader, writer, body), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            writer.close()
+            if not reused:
+                raise
+            # Сервер мог закрыть простаивавшее соединение: одна попытка через новое
+            reader, writer, _reused = await self._connection(fresh=True)
+            try:
+                status, keep_alive = await asyncio.wait_for(self._request(reader, writer, body), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        if status != HTTPStatus.OK:
+            raise SubmissionError(f"{self.url}: HTTP {status}")
+
+    async def _connection(self, fresh=False):
+        while self._idle and not fresh:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        return reader, writer, False
+
+    async def _request(self, reader, writer, body):
+        writer.write(
+            f"POST {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Сервер закрыл соединение")
+        status = int(status_line.split()[1])
+        headers = await read_headers(reader)
+        await reader.readexactly(int(headers.get("content-length", 0)))
+        return status, headers.get("connection", "").lower() != "close"
+
+    async def close(self):
+        for _reader, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class SqliteTransport:
+    """Запись порций напрямую в базу приёма (IntakeDatabase) - доставка без сети."""
+
+    def __init__(self, path=INTAKE_DB_PATH):
+        self.path = path
+
+    async def send(self, orders):
+        await asyncio.get_running_loop().run_in_executor(None, self._store, orders)
+
+    def _store(self, orders):
+        with IntakeDatabase(self.path) as database:
+            database.store(orders)
+
+    async def close(self):
+        pass
+
+
+def make_transport(target):
+    """Транспорт по адресу: http://... - HttpTransport, путь к файлу - SqliteTransport.
+
+    Адрес с другой схемой (https://, ftp://, ...) - ValueError: такой адрес
+    нельзя принять за путь к базе приёма.
+    """
+    scheme = urllib.parse.urlsplit(target).scheme
+    if scheme == "http":
+        if not urllib.parse.urlsplit(target).hostname:
+            raise ValueError(f"В адресе точки приёма нет имени хоста: {target}")
+        return HttpTransport(target)
+    # Однобуквенная "схема" - диск в пути Windows (C:\...)
+    if scheme and len(scheme) > 1:
+        raise ValueError(f"Неподдерживаемый адрес точки приёма (нужен http:// или путь к файлу): {target}")
+    return SqliteTransport(target)
+
+
+class SubmissionService:
+    """Фоновая доставка заказов из очереди на диске.
+
+    Цикл asyncio работает в отдельном потоке; submit() можно вызывать из
+    любого потока. listener(ожидают, ошибка) вызывается в потоке доставки
+    после каждой порции и после постановки заказа в очередь.
+    """
+
+    def __init__(self, transport, outbox_path=OUTBOX_PATH, batch_size=BATCH_SIZE,
+                 concurrency=CONCURRENCY, listener=None):
+        self.transport = transport
+        self.outbox_path = outbox_path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.listener = listener
+        self._outbox = None
+        self._loop = asyncio.new_event_loop()
+        self._wakeup = None
+        self._main = None
+        self._thread = threading.Thread(target=self._run, name="submission", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, order, commission):
+        """Записать заказ (Order) в очередь на диске и разбудить доставку; сеть не ждёт.
+
+        Ошибка записи в очередь передаётся вызывающему. Возвращает False,
+        если поток доставки уже завершился: заказ остаётся в очереди и будет
+        отправлен новым SubmissionService.
+        """
+        outbox = Outbox(self.outbox_path)
+        try:
+            outbox.put(order_payload(order, commission))
+        finally:
+            outbox.close()
+        try:
+            self._loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:  # Цикл доставки закрыт (остановлен или упал)
+            return False
+        return True
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Остановить доставку; неотправленные заказы остаются в очереди на диске."""
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._shutdown)
+            self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._outbox = Outbox(self.outbox_path, release_claimed=True)
+        self._wakeup = asyncio.Event()
+        self._main = self._loop.create_task(self._dispatch())
+        try:
+            self._loop.run_until_complete(self._main)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(self.transport.close())
+            self._outbox.close()
+            self._loop.close()
+
+    def _shutdown(self):
+        if self._main is not None:
+            self._main.cancel()
+
+    def _notify(self, error=None):
+        if self.listener is not None:
+            self.listener(self._outbox.pending_count(), error)
+
+    def _wake(self):
+        self._wakeup.set()
+        self._notify()
+
+    async def _dispatch(self):
+        in_flight = set()
+        wakeup = None
+        try:
+            while True:
+                while len(in_flight) < self.concurrency:
+                    batch = self._outbox.claim_due(self.batch_size)
+                    if not batch:
+                        break
+                    in_flight.add(self._loop.create_task(self._send(batch)))
+                if wakeup is None or wakeup.done():
+                    self._wakeup.clear()
+                    wakeup = self._loop.create_task(self._wakeup.wait())
+                # Пока все места заняты, ждать нужно только завершения порции или
+                # нового заказа; срок отложенных заказов важен, лишь когда есть свободное место
+                timeout = None
+                if len(in_flight) < self.concurrency:
+                    timeout = self._outbox.next_attempt_delay()
+                    if timeout is not None:
+                        timeout = max(timeout, BATCH_WINDOW)
+                done, _pending = await asyncio.wait(
+                    in_flight | {wakeup}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                in_flight -= done
+                if wakeup in done:
+                    await asyncio.sleep(BATCH_WINDOW)  # Даём набраться порции
+        finally:
+            for task in in_flight | ({wakeup} if wakeup else set()):
+                task.cancel()
+
+    async def _send(self, batch):
+        ids = [row_id for row_id, _payload, _queued_at, _attempts in batch]
+        span = instrumentation.start("submit_batch", memory=False)
+        try:
+            await self.transport.send([payload for _row_id, payload, _queued_at, _attempts in batch])
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            span.finish(rows=len(batch), error=error)
+            attempts = max(attempts for _row_id, _payload, _queued_at, attempts in batch)
+            self._outbox.release(ids, error, backoff_delay(attempts))
+            self._notify(error)
+            return
+        span.finish(rows=len(batch))
+        self._outbox.delete(ids)
+        now = time.time()
+        latency = sum(now - queued_at for _row_id, _payload, queued_at, _attempts in batch) / len(batch)
+        instrumentation.record_duration("submit_latency", latency, rows=len(batch))
+        self._notify()
+
+
+class LocalReceiver:
+    """Локальная точка приёма для проверки: HTTP-сервер, сохраняющий заказы в базу приёма.
+
+    fail_rate - доля запросов, на которые отвечать 503 (для проверки повторов).
+    """
+
+    def __init__(self, db_path=INTAKE_DB_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT, fail_rate=0.0):
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.fail_rate = fail_rate
+        self._database = None
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}{INTAKE_PATH}"
+
+    async def serve(self, started=None):
+        """Принимать заказы до отмены задачи; started (threading.Event) отмечается после запуска."""
+        self._database = IntakeDatabase(self.db_path)
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        if started is not None:
+            started.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._database.close()
+
+    def start(self):
+        """Запустить сервер в фоновом потоке и вернуть его адрес (port=0 - любой свободный порт)."""
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._task = self._loop.create_task(self.serve(started))
+
+        def run():
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="receiver", daemon=True)
+        self._thread.start()
+        started.wait(TIMEOUT)
+        return self.url
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(STOP_TIMEOUT)
+            self._thread = None
+
+    def _respond(self, method, path, body):
+        if method != "POST" or path != INTAKE_PATH:
+            return HTTPStatus.NOT_FOUND, {"error": "not found"}
+        if self.fail_rate and random.random() < self.fail_rate:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "try later"}
+        try:
+            orders = json.loads(body)["orders"]
+        except (ValueError, KeyError, TypeError):
+            return HTTPStatus.BAD_REQUEST, {"error": "bad request"}
+        return HTTPStatus.OK, {"accepted": self._database.store(orders)}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _version = request_line.decode("latin-1").split(" ", 2)
+                headers = await read_headers(reader)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response = self._respond(method, path, body)
+                content = json.dumps(response).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n\r\n".encode("latin-1") + content
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Локальная точка приёма заказов.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="принимать заказы по HTTP и сохранять в базу приёма")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--db", default=INTAKE_DB_PATH, help="файл базы приёма")
+    serve.add_argument("--fail-rate", type=float, default=0.0, help="доля запросов с ответом 503")
+    args = parser.parse_args(argv)
+
+    receiver = LocalReceiver(args.db, args.host, args.port, args.fail_rate)
+    print(f"Приём заказов: {receiver.url} -> {args.db}")
+    try:
+        asyncio.run(receiver.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
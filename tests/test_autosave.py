@@ -0,0 +1,90 @@
+"""Проверки журнала автосохранения autosave."""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autosave
+from autosave import JournalLock, JournalState, OrderJournal, claim_journal, line_values, replay_journal
+
+
+def write_records(path, records, tail=""):
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        file.write(tail)
+
+
+def test_replay_skips_cut_off_last_line(tmp_path):
+    path = str(tmp_path / "order.jsonl")
+    write_records(path, [
+        {"op": "info", "field": "company", "value": "Alpha"},
+        {"op": "rows", "row": None, "lines": [line_values("болт", "шт", 2, 3, "")]},
+    ], tail='{"op": "info", "field": "phone", "va')
+
+    state, count = replay_journal(path)
+    assert count == 2
+    assert state.info["company"] == "Alpha"
+    assert state.info["phone"] == ""
+    assert state.names == ["болт"]
+
+
+def test_apply_rows_set_and_remove():
+    state = JournalState()
+    state.apply({"op": "rows", "row": None, "lines": [line_values("a", "шт", 1, 1, ""),
+                                                      line_values("c", "шт", 3, 3, "")]})
+    state.apply({"op": "rows", "row": 1, "lines": [line_values("b", "кг", 2, 2, "x")]})
+    assert state.names == ["a", "b", "c"]
+    assert state.units == ["шт", "кг", "шт"]
+
+    state.apply({"op": "set", "row": 2, "line": line_values("d", "м", 4, 5, "")})
+    state.apply({"op": "set", "row": 10, "line": line_values("z", "м", 0, 0, "")})  # Строки уже нет
+    state.apply({"op": "remove", "row": 0, "count": 2})
+    assert state.names == ["d"]
+    assert state.quantities == [4]
+    assert state.prices == [5]
+
+
+def test_journal_compacts_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(autosave, "COMPACT_EVERY", 3)
+    path = str(tmp_path / "order.jsonl")
+    journal = OrderJournal(path)
+    for number in range(4):
+        journal.append({"op": "rows", "row": None, "lines": [line_values(f"p{number}", "шт", 1, number, "")]})
+    journal.close()
+
+    with open(path, encoding="utf-8") as file:
+        ops = [json.loads(text)["op"] for text in file]
+    assert ops == ["snapshot", "rows"]
+    state, _count = replay_journal(path)
+    assert state.names == ["p0", "p1", "p2", "p3"]
+    assert state.prices == [0, 1, 2, 3]
+
+
+def test_recovered_journal_keeps_state(tmp_path):
+    path = str(tmp_path / "order.jsonl")
+    write_records(path, [{"op": "info", "field": "serial", "value": "S-1"}])
+    state, _count = replay_journal(path)
+
+    lock = claim_journal(path)
+    journal = OrderJournal(path, state, lock)
+    journal.append({"op": "commission", "value": 10})
+    journal.close()
+
+    recovered, count = replay_journal(path)
+    assert count == 2  # Снимок восстановленного состояния и новая запись
+    assert recovered.info["serial"] == "S-1"
+    assert recovered.commission == 10
+
+
+def test_claimed_journal_is_not_claimed_again(tmp_path):
+    path = str(tmp_path / "order.jsonl")
+    write_records(path, [{"op": "info", "field": "serial", "value": "S-1"}])
+
+    lock = claim_journal(path)
+    assert lock is not None
+    assert not JournalLock(path).acquire()
+    lock.release()
+    assert claim_journal(path) is not None
+    assert claim_journal(str(tmp_path / "missing.jsonl")) is None
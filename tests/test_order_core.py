@@ -0,0 +1,51 @@
+"""Проверки расчётов order_core."""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_core import RESYNC_INTERVAL, OrderLine, RunningTotal, order_subtotal, parse_number
+
+
+def test_parse_number_rejects_non_finite():
+    for text in ("nan", "NaN", "inf", "-inf", "Infinity", float("nan"), float("inf")):
+        assert parse_number(text) == 0.0
+    assert parse_number("2,5") == 2.5
+
+
+def test_running_total_recovers_from_non_finite_delta():
+    sums = [3.0, 4.0]
+    total = RunningTotal()
+    total.reset(sums)
+
+    # Строка с бесконечной суммой (например, переполнение) делает итог неконечным
+    total.replace(sums[1], math.inf)
+    sums[1] = math.inf
+    assert total.needs_resync
+
+    # После исправления строки пересчёт даёт правильный итог, а не nan
+    total.replace(sums[1], 4.0)
+    sums[1] = 4.0
+    assert total.needs_resync
+    total.reset(sums)
+    assert total.subtotal == 7.0
+    assert not total.needs_resync
+
+
+def test_running_total_resync_interval():
+    total = RunningTotal()
+    for _change in range(RESYNC_INTERVAL):
+        total.add([1.0])
+    assert total.needs_resync
+
+
+def test_overflowing_row_sums_give_infinite_total():
+    total = RunningTotal()
+    total.reset([1e308, 1e308])
+    assert total.subtotal == math.inf
+
+    total.add([1e308])
+    total.remove(x for x in [1e308, 1e308])
+    assert not math.isfinite(total.subtotal)
+    assert order_subtotal([OrderLine("a", "шт", 1e308, 1), OrderLine("b", "шт", 1e308, 1)]) == math.inf
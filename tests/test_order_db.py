@@ -0,0 +1,44 @@
+"""Проверки базы заказов order_db."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_core import DEFAULT_SERIAL, Order, OrderLine
+from order_db import OrderDatabase
+
+
+def make_order(serial, *names, start_date="01.12.2024"):
+    return Order(serial=serial, company="Фирма", start_date=start_date, end_date="31.12.2024",
+                 lines=[OrderLine(name, "шт", 1, 2) for name in names])
+
+
+def test_saving_same_serial_replaces_order(tmp_path):
+    with OrderDatabase(str(tmp_path / "orders.db")) as database:
+        first_id = database.save_order(make_order("A-1", "болт", "гайка"))
+        second_id = database.save_order(make_order("A-1", "шайба"))
+        database.save_order(make_order("B-2", "винт"))
+
+        assert second_id == first_id
+        assert [order_id for order_id, _order in database.find_by_serial("A-1")] == [first_id]
+        assert [line.name for line in database.load_order(first_id).lines] == ["шайба"]
+
+
+def test_find_by_dates_uses_iso_dates(tmp_path):
+    with OrderDatabase(str(tmp_path / "orders.db")) as database:
+        database.save_order(make_order("A-1", start_date="2024-12-01"))
+        database.save_order(make_order("B-2", start_date="15.01.2025"))
+
+        found = database.find_by_dates("2024-11-30", "2024-12-31")
+        assert [order.serial for _order_id, order in found] == ["A-1"]
+        assert database.find_by_serial("B-2")[0][1].start_date == "2025-01-15"
+
+
+def test_orders_without_serial_are_not_replaced(tmp_path):
+    with OrderDatabase(str(tmp_path / "orders.db")) as database:
+        alpha_id = database.save_order(Order(company="Alpha"))
+        beta_id = database.save_order(Order(company="Beta"))
+        default_id = database.save_order(Order(serial=DEFAULT_SERIAL, company="Gamma"))
+
+        assert len({alpha_id, beta_id, default_id}) == 3
+        assert [order.company for _order_id, order in database.find_by_company("Alpha")] == ["Alpha"]
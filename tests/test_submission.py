@@ -0,0 +1,85 @@
+"""Проверки очереди отправки submission."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import submission
+from order_core import Order, OrderLine
+from submission import (
+    BACKOFF_MAX, HttpTransport, Outbox, SqliteTransport, SubmissionService, backoff_delay, make_transport
+)
+
+
+def test_claimed_orders_are_not_claimed_twice(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    ids = [outbox.put({"serial": str(number)}) for number in range(3)]
+
+    first = outbox.claim_due(2)
+    assert [row[0] for row in first] == ids[:2]
+    assert [row[0] for row in outbox.claim_due(10)] == ids[2:]
+    assert outbox.claim_due(10) == []
+
+    outbox.delete(ids[:2])
+    assert outbox.pending_count() == 1
+    outbox.close()
+
+
+def test_released_orders_wait_for_backoff(tmp_path, monkeypatch):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    row_id = outbox.put({"serial": "1"})
+    outbox.claim_due(1)
+
+    outbox.release([row_id], "503", 60)
+    assert outbox.claim_due(1) == []
+    assert 59 < outbox.next_attempt_delay() <= 60
+
+    now = submission.time.time()
+    monkeypatch.setattr(submission.time, "time", lambda: now + 61)
+    [(claimed_id, payload, _queued_at, attempts)] = outbox.claim_due(1)
+    assert (claimed_id, payload, attempts) == (row_id, {"serial": "1"}, 1)
+    outbox.close()
+
+
+def test_claims_are_released_only_on_delivery_start(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = Outbox(path)
+    outbox.put({"serial": "1"})
+    assert len(outbox.claim_due(1)) == 1
+
+    Outbox(path).close()  # Запись заказа из окна не трогает отправляемые порции
+    assert outbox.claim_due(1) == []
+    Outbox(path, release_claimed=True).close()
+    assert len(outbox.claim_due(1)) == 1
+    outbox.close()
+
+
+def test_backoff_delay_grows_and_is_capped():
+    for attempts in range(4):
+        delay = backoff_delay(attempts)
+        assert submission.BACKOFF_BASE * 2 ** attempts / 2 <= delay <= submission.BACKOFF_BASE * 2 ** attempts
+    assert backoff_delay(50) <= BACKOFF_MAX
+
+
+def test_make_transport_schemes():
+    assert isinstance(make_transport("http://127.0.0.1:8765/orders"), HttpTransport)
+    assert isinstance(make_transport("intake.db"), SqliteTransport)
+    assert isinstance(make_transport("C:\\data\\intake.db"), SqliteTransport)
+    for target in ("https://intake.example/orders", "ftp://host/file", "http:///orders"):
+        with pytest.raises(ValueError):
+            make_transport(target)
+
+
+def test_submit_to_stopped_service_keeps_order(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    service = SubmissionService(SqliteTransport(str(tmp_path / "intake.db")), path)
+    service.start()
+    service.stop()
+
+    order = Order(serial="S-1", lines=[OrderLine("болт", "шт", 2, 3)])
+    assert service.submit(order, 15) is False
+    outbox = Outbox(path)
+    assert outbox.pending_count() == 1
+    outbox.close()
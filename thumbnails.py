@@ -0,0 +1,187 @@
+"""Миниатюры изображений заказа: фоновое декодирование и кэш по хешу содержимого."""
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPixmap
+
+from image_store import file_digest
+
+# Размер стороны миниатюры в пикселях
+THUMBNAIL_SIZE = 150
+# Сколько миниатюр держать в памяти
+MEMORY_CACHE_SIZE = 200
+
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(str, str, QImage)  # Путь к файлу, хеш, миниатюра
+    failed = pyqtSignal(str, str)  # Путь к файлу, описание ошибки
+
+
+class ThumbnailJob(QRunnable):
+    """Построение миниатюры в фоновом потоке.
+
+    Если миниатюра уже есть в дисковом кэше, читается только она. Иначе
+    изображение декодируется сразу в уменьшенном размере через
+    QImageReader.setScaledSize и сохраняется в кэш.
+    """
+
+    def __init__(self, file_path, cache_dir, digest=None, size=THUMBNAIL_SIZE):
+        super().__init__()
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.digest = digest
+        self.size = size
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        try:
+            digest = self.digest or file_digest(self.file_path)
+        except OSError as e:
+            self.signals.failed.emit(self.file_path, str(e))
+            return
+
+        thumbnail_path = os.path.join(self.cache_dir, f"{digest}.png")
+        image = QImage(thumbnail_path) if os.path.exists(thumbnail_path) else QImage()
+        if image.isNull():
+            reader = QImageReader(self.file_path)
+            reader.setAutoTransform(True)
+            original_size = reader.size()
+            if original_size.isValid():
+                reader.setScaledSize(original_size.scaled(self.size, self.size, Qt.KeepAspectRatio))
+            image = reader.read()
+            if image.isNull():
+                self.signals.failed.emit(self.file_path, reader.errorString())
+                return
+            image.save(thumbnail_path)
+        self.signals.ready.emit(self.file_path, digest, image)
+
+
+class ThumbnailCache:
+    """LRU-кэш миниатюр в памяти: хеш содержимого -> QPixmap."""
+
+    def __init__(self, capacity=MEMORY_CACHE_SIZE):
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def get(self, digest):
+        pixmap = self._items.get(digest)
+        if pixmap is not None:
+            self._items.move_to_end(digest)
+        return pixmap
+
+    def put(self, digest, pixmap):
+        self._items[digest] = pixmap
+        self._items.move_to_end(digest)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+class ThumbnailListModel(QAbstractListModel):
+    """Список изображений заказа для QListView.
+
+    Миниатюра запрашивается только тогда, когда представление обращается
+    к элементу (то есть он виден), и строится в пуле потоков.
+    """
+
+    def __init__(self, cache_dir, parent=None):
+        super().__init__(parent)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._paths = []
+        self._digests = {}  # Путь -> хеш содержимого
+        self._jobs = {}  # Путь -> выполняющаяся задача
+        self._failed = set()  # Пути, которые не удалось прочитать (повторно не запрашиваются)
+        self._cache = ThumbnailCache()
+        self._placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self._placeholder.fill(QColor("#eeeeee"))
+        self._broken = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self._broken.fill(QColor("#f4cccc"))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ToolTipRole:
+            return path
+        if role == Qt.DecorationRole:
+            if path in self._failed:
+                return self._broken
+            digest = self._digests.get(path)
+            pixmap = self._cache.get(digest) if digest else None
+            if pixmap is None:
+                self._request_thumbnail(path)
+                return self._placeholder
+            return pixmap
+        return None
+
+    def _request_thumbnail(self, path):
+        if path in self._jobs:
+            return
+        job = ThumbnailJob(path, self.cache_dir, self._digests.get(path))
+        job.signals.ready.connect(self._on_thumbnail_ready)
+        job.signals.failed.connect(self._on_thumbnail_failed)
+        self._jobs[path] = job
+        QThreadPool.globalInstance().start(job)
+
+    def _on_thumbnail_ready(self, path, digest, image):
+        self._jobs.pop(path, None)
+        self._digests[path] = digest
+        # QPixmap можно создавать только в главном потоке
+        self._cache.put(digest, QPixmap.fromImage(image))
+        self._emit_changed(path)
+
+    def _on_thumbnail_failed(self, path, error):
+        self._jobs.pop(path, None)
+        self._failed.add(path)
+        print(f"Ошибка при загрузке изображения {path}: {error}")
+        self._emit_changed(path)
+
+    def _emit_changed(self, path):
+        for row, row_path in enumerate(self._paths):
+            if row_path == path:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def add_image(self, path, digest=None):
+        """Добавить изображение в конец списка (digest - хеш содержимого, если уже известен)."""
+        row = len(self._paths)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._failed.discard(path)  # Файл мог быть заменён: пробуем прочитать заново
+        self._paths.append(path)
+        if digest:
+            self._digests[path] = digest
+        self.endInsertRows()
+
+    def remove_image(self, row):
+        """Убрать изображение из списка и вернуть путь к нему."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        path = self._paths.pop(row)
+        self.endRemoveRows()
+        return path
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self.endResetModel()
+
+    def take_items(self):
+        """Забрать список изображений в виде [(путь, хеш)], оставив модель пустой."""
+        items = [(path, self._digests.get(path)) for path in self._paths]
+        self.clear()
+        return items
+
+    def set_items(self, items):
+        """Заменить список изображений (items - [(путь, хеш или None)])."""
+        self.beginResetModel()
+        self._paths = []
+        for path, digest in items:
+            self._paths.append(path)
+            if digest:
+                self._digests[path] = digest
+        self.endResetModel()
@@ -0,0 +1,123 @@
+"""Фоновые задачи загрузки и сохранения Excel в пуле потоков Qt.
+
+openpyxl и модули, которые от него зависят, импортируются при первом
+выполнении задачи в фоновом потоке, а не при запуске приложения.
+"""
+import threading
+from abc import ABCMeta, abstractmethod
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class JobSignals(QObject):
+    """Сигналы фоновой задачи.
+
+    Объект создаётся в главном потоке, поэтому подключённые слоты
+    вызываются в главном потоке через очередь событий.
+    """
+    progress = pyqtSignal(int, int)  # Обработано строк, всего строк
+    info = pyqtSignal(object)  # Order с полями шапки
+    rows = pyqtSignal(list)  # Очередная порция OrderLine
+    result = pyqtSignal(object)  # Результат задачи, если он есть
+    finished = pyqtSignal(bool)  # True - задача выполнена, False - отменена
+    failed = pyqtSignal(str)
+
+
+class _JobMeta(type(QRunnable), ABCMeta):
+    """Метакласс, совмещающий QRunnable и abc (для абстрактного execute)."""
+
+
+class ExcelJob(QRunnable, metaclass=_JobMeta):
+    """Базовая задача с поддержкой отмены; подклассы реализуют execute()."""
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self.signals = JobSignals()
+        self.rows_done = 0  # Сколько строк обработано (для статистики)
+        self.order_id = None  # Вкладка заказа, для которой выполняется задача
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Запросить отмену задачи."""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            completed = self.execute()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(completed)
+
+    @abstractmethod
+    def execute(self):
+        """Выполнить работу задачи; вернуть True, если выполнена, False - если отменена."""
+
+
+class LoadExcelJob(ExcelJob):
+    """Чтение заказа из Excel с передачей строк порциями."""
+
+    def execute(self):
+        from excel_io import read_order
+
+        order, chunks, total_rows = read_order(self.file_path)
+        self.signals.info.emit(order)
+        loaded = 0
+        for chunk in chunks:
+            if self.is_cancelled():
+                chunks.close()
+                return False
+            self.signals.rows.emit(chunk)
+            loaded += len(chunk)
+            self.rows_done = loaded
+            # total_rows == 0: число строк неизвестно (в файле нет размеров листа)
+            self.signals.progress.emit(loaded, max(total_rows, loaded) if total_rows else 0)
+        return True
+
+
+class ReplayJournalJob(ExcelJob):
+    """Чтение журнала автосохранения заказа; результат - JournalState."""
+
+    def execute(self):
+        from autosave import replay_journal
+
+        state, self.rows_done = replay_journal(self.file_path)
+        self.signals.result.emit(state)
+        return True
+
+
+class OpenCatalogJob(ExcelJob):
+    """Открытие каталога цен (с перестроением кэша, если прайс-лист изменился)."""
+
+    def execute(self):
+        from price_catalog import PriceCatalog
+
+        self.signals.result.emit(PriceCatalog.open(self.file_path))
+        return True
+
+
+class SaveExcelJob(ExcelJob):
+    """Сохранение снимка заказа в Excel и, если указан db_path, в базу заказов."""
+
+    def __init__(self, file_path, order, db_path=None):
+        super().__init__(file_path)
+        self.order = order
+        self.db_path = db_path
+
+    def execute(self):
+        from excel_io import write_order
+        from order_db import OrderDatabase
+
+        saved = write_order(
+            self.file_path, self.order,
+            progress=self.signals.progress.emit, is_cancelled=self.is_cancelled
+        )
+        self.rows_done = len(self.order.lines)
+        if saved and self.db_path:
+            with OrderDatabase(self.db_path) as database:
+                database.save_order(self.order)
+        return saved